@@ -1,10 +1,18 @@
-import time
-import uuid
-from typing import Any, Dict, Generator, List, Optional
 import contextvars
+import copy
+import dataclasses
+import hashlib
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
 
 import mlx.core as mx
 import mlx.nn as nn
+import numpy as np
 from mlx_lm.generate import GenerationResponse, stream_generate
 from mlx_lm.sample_utils import make_logits_processors, make_sampler
 from mlx_lm.tokenizer_utils import TokenizerWrapper
@@ -17,33 +25,171 @@ from ..schema import (
     ChatCompletionRequest,
     ChatCompletionResponse,
     ChatCompletionUsage,
-    ChatMessage,
     ChatDelta,
+    ChatMessage,
     DeltaToolCall,
     Role,
 )
 from ..text_models import BaseTextModel, GenerateResult, GenerationParams
 from .outlines_logits_processor import OutlinesLogitsProcessor
-from .prompt_cache import PromptCache
-from .stop_tokens_checker import StopTokensChecker
+from .prompt_cache import PromptCache, PromptCachePool
+from .scheduler import BatchingScheduler
+from .stop_tokens_checker import StopTokensChecker, get_stop_tokens_checker
 from .tools.chat_tokenizer import ChatTokenizer
 from .tools.reasoning_decoder import ReasoningDecoder
 
 
 class RequestContext:
     """Context for a single request to avoid shared state issues"""
-    
+
     def __init__(self, model_id: str, model: nn.Module, tokenizer: ChatTokenizer):
-        self.prompt_cache = PromptCache()
+        # Checked out of the shared pool in `_prepare_generation`
+        self.prompt_cache: Optional[PromptCache] = None
         self.prompt_cache_tokens_count = 0
         self.reasoning_decoder = ReasoningDecoder(tokenizer)
         self.model_id = model_id
         self.model = model
 
 
-# Context variable for request-specific data
-_request_context: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
-    'request_context', default=None
+class RequestContextRegistry:
+    """LRU of request contexts keyed by conversation.
+
+    A follow-up turn gets back the context of the conversation it continues.
+    Contexts are checked out while a request uses them, so concurrent
+    requests never share a reasoning decoder; a concurrent turn of the same
+    conversation simply gets a fresh context. Prompt caches are not kept
+    here: they go to the shared pool, where the follow-up turn finds its own
+    cache as the longest matching prefix.
+    """
+
+    def __init__(self, capacity: int = 4):
+        self.capacity = capacity
+        self._contexts: "OrderedDict[str, RequestContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def acquire(self, key: str) -> Optional[RequestContext]:
+        with self._lock:
+            return self._contexts.pop(key, None)
+
+    def release(self, key: str, context: RequestContext) -> None:
+        # The cache itself is handed over to the pool rather than copied, so
+        # each KV cache lives in exactly one place
+        if context.prompt_cache is not None:
+            _prompt_cache_pool.release(context.prompt_cache)
+            context.prompt_cache = None
+
+        with self._lock:
+            self._contexts.pop(key, None)
+            self._contexts[key] = context
+            while len(self._contexts) > self.capacity:
+                self._contexts.popitem(last=False)
+
+
+# All params declare in `make_sampler`
+_SAMPLER_PARAMS = frozenset(
+    {
+        "top_k",
+        "min_tokens_to_keep",
+        "min_p",
+        "xtc_probability",
+        "xtc_threshold",
+        "xtc_special_tokens",
+    }
+)
+# Knowned params using in model config
+_MODEL_PARAMS = frozenset(
+    {
+        "adapter_path",
+        # Additional config for `apply_chat_template`
+        "chat_template_config",
+    }
+)
+# Quick template params, same param will be overrided by `chat_template_config`
+_TEMPLATE_PARAMS = frozenset(
+    {
+        # Qwen3
+        "enable_thinking",
+        "thinking_budget",
+        # Claude
+        "thinking",
+        # Gemini
+        "thinkingConfig",
+        # Grok
+        "reasoning_effort",
+        # Others
+        "reasoning",
+    }
+)
+# KV cache quantization, passed straight through to `generate_step`
+_KV_CACHE_PARAMS = frozenset({"kv_bits", "kv_group_size", "quantized_kv_start"})
+# Extra param name -> kwargs bucket, anything else goes to `generate`
+_PARAM_ROUTING: Dict[str, str] = (
+    {key: "sampler" for key in _SAMPLER_PARAMS}
+    | {key: "model" for key in _MODEL_PARAMS}
+    | {key: "template" for key in _TEMPLATE_PARAMS}
+    | {key: "generate" for key in _KV_CACHE_PARAMS}
+)
+
+
+def _with_own_detokenizer(tokenizer: TokenizerWrapper) -> TokenizerWrapper:
+    """Wrapper over the same HF tokenizer with a detokenizer of its own.
+
+    `stream_generate` streams through `tokenizer.detokenizer`, one stateful
+    instance per tokenizer, so concurrent requests must not share it.
+    """
+    wrapper = TokenizerWrapper.__new__(TokenizerWrapper)
+    wrapper._tokenizer = tokenizer._tokenizer
+    wrapper._detokenizer = copy.copy(tokenizer.detokenizer)
+    wrapper._eos_token_ids = tokenizer.eos_token_ids
+    return wrapper
+
+
+def _pack_logprobs(
+    response: GenerationResponse, top_k: Optional[int]
+) -> GenerationResponse:
+    """Pull the logprobs a response needs off the device as one numpy array.
+
+    The array holds the sampled token's logprob, then with `top_k` the top
+    logprobs followed by their token ids. Runs where the model runs, so the
+    consumer only ever sees host values.
+    """
+    if response.finish_reason is not None:
+        return response
+
+    current_token = response.token
+    current_logprobs = response.logprobs
+
+    # Gather everything that has to leave the device into one array, so a
+    # token costs a single eval and host copy instead of one per value
+    token_logprob = current_logprobs[current_token : current_token + 1]
+    if top_k:
+        # Partition on the positive logprobs so the top_k tokens land at the
+        # tail, avoiding a negated copy of the full vocab
+        vocab_size = current_logprobs.shape[-1]
+        top_indices = mx.argpartition(current_logprobs, kth=vocab_size - top_k)[-top_k:]
+        packed = mx.concatenate(
+            [
+                token_logprob.astype(mx.float32),
+                current_logprobs[top_indices].astype(mx.float32),
+                top_indices.astype(mx.float32),
+            ]
+        )
+    else:
+        packed = token_logprob.astype(mx.float32)
+    return dataclasses.replace(response, logprobs=np.asarray(packed))
+
+
+# Idle prompt caches shared by all requests, matched by longest token prefix
+_prompt_cache_pool = PromptCachePool(
+    capacity=max(1, int(os.getenv("MLX_OMNI_PROMPT_CACHE_SIZE", "4"))),
+    max_bytes=int(float(os.getenv("MLX_OMNI_PROMPT_CACHE_MAX_MB", "4096")) * 2**20),
+)
+
+_request_context: contextvars.ContextVar[Optional[RequestContext]] = (
+    contextvars.ContextVar("request_context", default=None)
 )
 
 
@@ -57,109 +203,130 @@ class MLXModel(BaseTextModel):
         self._default_temperature = 1.0
         self._default_top_p = 1.0
         self._default_top_k = -1
+        # Long prompts get a quantized KV cache unless the request sets `kv_bits`
+        self._default_kv_bits = int(os.getenv("MLX_OMNI_KV_BITS", "8")) or None
+        self._default_kv_group_size = 64
+        self._kv_quantization_min_tokens = int(
+            os.getenv("MLX_OMNI_KV_QUANT_MIN_TOKENS", "4096")
+        )
         self._chat_tokenizer = tokenizer
+        # Interleave concurrent requests on one scheduler thread when enabled
+        self._scheduler: Optional[BatchingScheduler] = None
+        if os.getenv("MLX_OMNI_CONTINUOUS_BATCH") == "1":
+            self._scheduler = BatchingScheduler(self._model, tokenizer.tokenizer)
+        # Without the scheduler, requests run on their own worker threads and
+        # take turns on the model one step at a time
+        self._generation_lock = threading.Lock()
+        self._contexts = RequestContextRegistry(
+            capacity=max(1, int(os.getenv("MLX_OMNI_CONVERSATION_CACHE_SIZE", "4")))
+        )
+        # Token id -> (text, utf-8 bytes); bound to this model's tokenizer
+        self._decode_token = lru_cache(maxsize=131072)(self._decode_token_uncached)
         logger.info(f"Initialized MLXModel with model_id: {model_id}")
 
+    def _decode_token_uncached(self, token_id: int) -> Tuple[str, Tuple[int, ...]]:
+        token_str = self._chat_tokenizer.tokenizer.decode([token_id])
+        return token_str, tuple(token_str.encode("utf-8"))
+
     def _get_request_context(self) -> RequestContext:
         """Get or create request context for current async context"""
         context = _request_context.get()
         if context is None:
-            context = RequestContext(
-                self._model_id, self._model, self._chat_tokenizer
-            )
+            context = RequestContext(self._model_id, self._model, self._chat_tokenizer)
             _request_context.set(context)
         return context
 
+    def _conversation_key(self, request: ChatCompletionRequest) -> str:
+        """Stable id of a conversation: its system prompt, tools and first user turn."""
+        digest = hashlib.sha256(self._model_id.encode())
+        for message in request.messages:
+            digest.update(message.model_dump_json(exclude_none=True).encode())
+            if message.role == Role.USER:
+                break
+        for tool in request.tools or []:
+            digest.update(tool.model_dump_json(exclude_none=True).encode())
+        return digest.hexdigest()
+
+    def _open_request_context(
+        self, request: ChatCompletionRequest
+    ) -> Tuple[Optional[str], RequestContext, contextvars.Token]:
+        """Resolve the conversation's context and make it current for this request."""
+        key = None
+        context = None
+        # With nothing registered there is nothing to look up, the key is
+        # then only computed when the context is stored
+        if len(self._contexts):
+            key = self._conversation_key(request)
+            context = self._contexts.acquire(key)
+        if context is None:
+            context = RequestContext(self._model_id, self._model, self._chat_tokenizer)
+        return key, context, _request_context.set(context)
+
+    def _close_request_context(
+        self,
+        request: ChatCompletionRequest,
+        key: Optional[str],
+        context: RequestContext,
+        token: contextvars.Token,
+    ) -> None:
+        try:
+            _request_context.reset(token)
+        except ValueError:
+            # A generator closed from another context, nothing to restore there
+            pass
+        if key is None:
+            key = self._conversation_key(request)
+        self._contexts.release(key, context)
+
     def _get_generation_params(
         self, request: ChatCompletionRequest
     ) -> GenerationParams:
         params = request.get_extra_params()
 
-        # All params declare in `make_sampler`
-        sampler_params = {
-            "top_k",
-            "min_tokens_to_keep",
-            "min_p",
-            "xtc_probability",
-            "xtc_threshold",
-            "xtc_special_tokens",
-        }
-        # Knowned params using in model config
-        model_params = {
-            "adapter_path",
-            # Additional config for `apply_chat_template`
-            "chat_template_config",
-        }
-        # Quick template params, same param will be overrided by `chat_template_config`
-        template_params = {
-            # Qwen3
-            "enable_thinking",
-            "thinking_budget",
-            # Claude
-            "thinking",
-            # Gemini
-            "thinkingConfig",
-            # Grok
-            "reasoning_effort",
-            # Others
-            "reasoning",
+        buckets: Dict[str, Dict[str, Any]] = {
+            "sampler": {},
+            "model": {},
+            "generate": {},
+            "template": {},
         }
-
-        sampler_kwargs = {}
-        model_kwargs = {}
-        generate_kwargs = {}
-        template_kwargs = {}
-
         for key, value in params.items():
-            if key in sampler_params:
-                sampler_kwargs[key] = value
-            elif key in model_params:
-                model_kwargs[key] = value
-            elif key in template_params:
-                template_kwargs[key] = value
-            else:
-                generate_kwargs[key] = value
+            buckets[_PARAM_ROUTING.get(key, "generate")][key] = value
 
         return {
-            "sampler_kwargs": sampler_kwargs,
-            "model_kwargs": model_kwargs,
-            "generate_kwargs": generate_kwargs,
-            "template_kwargs": template_kwargs,
+            "sampler_kwargs": buckets["sampler"],
+            "model_kwargs": buckets["model"],
+            "generate_kwargs": buckets["generate"],
+            "template_kwargs": buckets["template"],
         }
 
     def _process_logprobs(
         self,
-        tokenizer: TokenizerWrapper,
         response: GenerationResponse,
         top_k: Optional[int],
     ) -> Optional[Dict[str, Any]]:
-        """Process logprobs information from generation response to match OpenAI format"""
+        """Process logprobs packed by `_pack_logprobs` into the OpenAI format"""
         current_token = response.token
-        current_logprobs = response.logprobs
+        values = response.logprobs
 
         # Get current token info
-        token_str = tokenizer.decode([current_token])
-        token_logprob = current_logprobs[current_token].item()
-        token_bytes = token_str.encode("utf-8")
+        token_str, token_bytes = self._decode_token(current_token)
 
         # Base token info
         token_info = {
             "token": token_str,
-            "logprob": token_logprob,
+            "logprob": float(values[0]),
             "bytes": list(token_bytes),
         }
 
         # Process top logprobs
         top_logprobs = []
-        if top_k is not None:
-            # Get indices of top_k tokens
-            top_indices = mx.argpartition(-current_logprobs, kth=top_k - 1)[:top_k]
-            top_probs = current_logprobs[top_indices]
+        if top_k:
+            top_probs = values[1 : top_k + 1].tolist()
+            top_ids = values[top_k + 1 :].astype(np.int64).tolist()
 
             # Create detailed token information for each top token
-            for idx, logprob in zip(top_indices.tolist(), top_probs.tolist()):
-                token = tokenizer.decode([idx])
-                token_bytes = token.encode("utf-8")
+            for idx, logprob in zip(top_ids, top_probs):
+                token, token_bytes = self._decode_token(idx)
                 top_logprobs.append(
                     {"token": token, "logprob": logprob, "bytes": list(token_bytes)}
                 )
@@ -179,11 +346,11 @@ class MLXModel(BaseTextModel):
             request: The chat completion request containing generation parameters
 
         Returns:
-            A tuple containing tokenizer, processed prompt, stop checker, and generation kwargs
+            A tuple containing processed prompt, stop checker, and generation kwargs
         """
         # Get request-specific context
         ctx = self._get_request_context()
-        
+
         # Process parameters from request
         params = self._get_generation_params(request)
 
@@ -227,39 +394,55 @@ class MLXModel(BaseTextModel):
         enable_thinking = template_kwargs.get("enable_thinking", True)
         ctx.reasoning_decoder.enable_thinking = enable_thinking
         if enable_thinking:
-            ctx.reasoning_decoder.set_thinking_prefix(True)
-            if prompt.endswith(f"<{ctx.reasoning_decoder.thinking_tag}>"):
-                ctx.reasoning_decoder.set_thinking_prefix(True)
-            else:
-                ctx.reasoning_decoder.set_thinking_prefix(False)
+            ctx.reasoning_decoder.set_thinking_prefix(
+                prompt.endswith(ctx.reasoning_decoder.thinking_suffix)
+            )
+        else:
+            ctx.reasoning_decoder.reset()
 
         # Get tokenizer
         tokenizer = self._chat_tokenizer.tokenizer
 
-        # Process prompt cache
-        tokenized_prompt = tokenizer.encode(prompt)
+        # Process prompt cache. The rendered template already carries BOS and
+        # the other special tokens, so it is encoded as-is, the same way
+        # `apply_chat_template(tokenize=True)` does
+        tokenized_prompt = tokenizer.encode(prompt, add_special_tokens=False)
+        # Take the cache sharing the longest prefix from the shared pool; for
+        # a follow-up turn that is normally its own conversation's cache
+        if ctx.prompt_cache is None:
+            ctx.prompt_cache = _prompt_cache_pool.acquire(
+                self._model_id, tokenized_prompt
+            )
         processed_prompt = ctx.prompt_cache.get_prompt_cache(
             self._model_id, self._model, tokenized_prompt
         )
         generate_kwargs["prompt_cache"] = ctx.prompt_cache.cache
         logger.debug(
-            f"Using {ctx.prompt_cache.cached_token_count} cached tokens out of {len(tokenized_prompt)} total tokens"
+            f"Using {ctx.prompt_cache.cached_token_count} cached tokens "
+            f"out of {len(tokenized_prompt)} total tokens"
         )
 
+        # Decode at long context is bound by KV cache reads, so quantize it
+        if (
+            "kv_bits" not in generate_kwargs
+            and self._default_kv_bits is not None
+            and len(tokenized_prompt) > self._kv_quantization_min_tokens
+        ):
+            generate_kwargs["kv_bits"] = self._default_kv_bits
+            generate_kwargs.setdefault("kv_group_size", self._default_kv_group_size)
+            logger.debug(f"Quantizing KV cache to {self._default_kv_bits} bits")
+
         # Setup stop tokens checker if needed
         stop_checker = None
         if request.stop:
-            stop_checker = StopTokensChecker(
-                stop_words=request.stop,
-                tokenizer=tokenizer,
-            )
+            stop_checker = get_stop_tokens_checker(request.stop, tokenizer)
 
         # Setup logits processors
         if request.response_format and request.response_format.json_schema:
             generate_kwargs["logits_processors"] = [
                 OutlinesLogitsProcessor(
-                    tokenizer,                      # Первый аргумент - tokenizer
-                    request.response_format,        # Второй аргумент - response_format
+                    tokenizer,  # Первый аргумент - tokenizer
+                    request.response_format,  # Второй аргумент - response_format
                 )
             ]
         elif request.logprobs:
@@ -276,10 +459,34 @@ class MLXModel(BaseTextModel):
 
         return processed_prompt, stop_checker, generate_kwargs
 
+    def _locked_steps(
+        self,
+        responses: Generator[GenerationResponse, None, None],
+        transform: Optional[Callable[[GenerationResponse], GenerationResponse]] = None,
+    ) -> Generator[GenerationResponse, None, None]:
+        """Advance `responses` under the model lock, one step at a time.
+
+        `transform` runs under the lock as well, so it may touch the device.
+        The lock is released before each response is handed out, so a slow
+        consumer never blocks other requests.
+        """
+        try:
+            while True:
+                with self._generation_lock:
+                    response = next(responses, None)
+                    if response is not None and transform is not None:
+                        response = transform(response)
+                if response is None:
+                    return
+                yield response
+        finally:
+            responses.close()
+
     def _stream_generate(
         self,
         request: ChatCompletionRequest,
     ) -> Generator[GenerateResult, None, None]:
+        completed = False
         try:
             # Get tokenizer
             tokenizer = self._chat_tokenizer.tokenizer
@@ -288,43 +495,97 @@ class MLXModel(BaseTextModel):
             processed_prompt, stop_checker, generate_kwargs = self._prepare_generation(
                 request
             )
+            ctx = self._get_request_context()
+            # Split reasoning from content as text arrives, so the end of the
+            # stream does not rescan the whole completion
+            reasoning_decoder = ctx.reasoning_decoder
+
+            # Compact int32 buffer, compared against the stop sequences as-is
+            current_tokens = array("i")
+            # Length of the text already yielded, only needed to replay a trimmed tail
+            text_offset = 0
+
+            # Request-level flags, resolved once instead of on every token
+            wants_logprobs = bool(request.logprobs)
+            top_logprobs = request.top_logprobs
+
+            # Logprobs leave the device next to the model call, the loop
+            # below only formats host values
+            transform = None
+            if wants_logprobs:
+                transform = partial(_pack_logprobs, top_k=top_logprobs)
+
+            if self._scheduler is not None:
+                responses = self._scheduler.submit(
+                    processed_prompt, transform=transform, **generate_kwargs
+                )
+            else:
+                responses = self._locked_steps(
+                    stream_generate(
+                        model=self._model,
+                        tokenizer=_with_own_detokenizer(tokenizer),
+                        prompt=processed_prompt,
+                        **generate_kwargs,
+                    ),
+                    transform,
+                )
+            has_stop = bool(request.stop and stop_checker)
+            plain_stream = not (wants_logprobs or has_stop)
 
-            current_tokens = []
-            last_text = ""
-
-            for response in stream_generate(
-                model=self._model,
-                tokenizer=tokenizer,
-                prompt=processed_prompt,
-                **generate_kwargs,
-            ):
+            # `response.text` is the incremental segment from mlx-lm's streaming
+            # detokenizer, so the completion is never re-decoded from scratch
+            for response in responses:
                 if response.finish_reason is not None:
+                    # Flush whatever the detokenizer was still holding back
+                    if response.text:
+                        reasoning_decoder.feed(response.text)
+                        yield GenerateResult(
+                            text=response.text,
+                            token=response.token,
+                            finish_reason=response.finish_reason,
+                            prompt_tokens=response.prompt_tokens,
+                            generation_tokens=response.generation_tokens,
+                        )
                     break
 
                 current_tokens.append(response.token)
 
+                if plain_stream:
+                    # Fast path: no logprobs and no stop words to trim
+                    if response.text:
+                        reasoning_decoder.feed(response.text)
+                        yield GenerateResult(
+                            text=response.text,
+                            token=response.token,
+                            finish_reason=None,
+                            prompt_tokens=response.prompt_tokens,
+                            generation_tokens=response.generation_tokens,
+                        )
+                    continue
+
                 logprobs = None
-                if request.logprobs:
-                    logprobs = self._process_logprobs(
-                        tokenizer, response, request.top_logprobs
-                    )
+                if wants_logprobs:
+                    logprobs = self._process_logprobs(response, top_logprobs)
 
                 finish_reason = response.finish_reason
                 should_trim = False
-                if request.stop and stop_checker:
+                if has_stop:
                     stop_condition = stop_checker.check_stop_condition(current_tokens)
                     if stop_condition.stop_met:
                         finish_reason = "stop"
                         if stop_condition.trim_length > 0:
-                            current_tokens = current_tokens[
-                                : -stop_condition.trim_length
-                            ]
+                            del current_tokens[-stop_condition.trim_length :]
                             should_trim = True
 
-                text = tokenizer.decode(current_tokens)
-                delta_text = text[len(last_text) :]
+                if should_trim:
+                    # The detokenizer may still hold text preceding the stop
+                    # sequence, so replay the trimmed tokens once
+                    delta_text = tokenizer.decode(current_tokens.tolist())[text_offset:]
+                else:
+                    delta_text = response.text
 
                 if delta_text or should_trim:
+                    reasoning_decoder.feed(delta_text)
                     yield GenerateResult(
                         text=delta_text,
                         token=response.token,
@@ -333,37 +594,45 @@ class MLXModel(BaseTextModel):
                         generation_tokens=response.generation_tokens,
                         logprobs=logprobs,
                     )
-                    last_text = text
+                    text_offset += len(delta_text)
 
                 if should_trim:
                     break
 
-            ctx = self._get_request_context()
+            # Stop the generator right away (and free a scheduler slot), not on GC
+            responses.close()
+
             ctx.prompt_cache_tokens_count = ctx.prompt_cache.cached_token_count
             logger.debug(
-                f"The generation is completed, with a total of {ctx.prompt_cache_tokens_count} tokens cached."
+                "The generation is completed, with a total of "
+                f"{ctx.prompt_cache_tokens_count} tokens cached."
             )
             ctx.prompt_cache.extend_completion_cache(current_tokens)
+            completed = True
         except Exception as e:
             logger.error(f"Error during stream generation: {str(e)}", exc_info=True)
             raise
+        finally:
+            # Only a cache that completed cleanly matches its tokens; on errors
+            # or early close it is dropped
+            if not completed:
+                self._get_request_context().prompt_cache = None
 
     def generate(
         self,
         request: ChatCompletionRequest,
     ) -> ChatCompletionResponse:
+        key, context, token = self._open_request_context(request)
         try:
-            completion = ""
+            completion_parts: List[str] = []
             logprobs_result_list = []
-            current_tokens = []
             finish_reason = "stop"
             result = None
 
             for result in self._stream_generate(request=request):
-                current_tokens.append(result.token)
-                completion = self._chat_tokenizer.tokenizer.decode(current_tokens)
+                completion_parts.append(result.text)
 
-                if request.logprobs:
+                if request.logprobs and result.logprobs:
                     logprobs_result_list.append(result.logprobs)
 
                 if result.finish_reason:
@@ -372,11 +641,17 @@ class MLXModel(BaseTextModel):
             if result is None:
                 raise RuntimeError("No tokens generated")
 
+            completion = "".join(completion_parts)
+
             logger.debug(f"Model Response:\n{completion}")
             reasoning: str | None = None  # avoid UnboundLocalError
-            enable_thinking = self._get_request_context().reasoning_decoder.enable_thinking
+            enable_thinking = (
+                self._get_request_context().reasoning_decoder.enable_thinking
+            )
             if enable_thinking:
-                reasoning_result = self._get_request_context().reasoning_decoder.decode(completion)
+                reasoning_result = (
+                    self._get_request_context().reasoning_decoder.finalize()
+                )
                 if reasoning_result:
                     logger.debug(f"Reasoning result:\n{reasoning_result}")
                     completion = reasoning_result.get("content")
@@ -401,7 +676,7 @@ class MLXModel(BaseTextModel):
                 prompt_tokens_details = PromptTokensDetails(cached_tokens=cached_tokens)
 
             return ChatCompletionResponse(
-                id=f"chatcmpl-{uuid.uuid4().hex[:10]}",
+                id=f"chatcmpl-{os.urandom(5).hex()}",
                 created=int(time.time()),
                 model=request.model,
                 system_fingerprint=request.model,
@@ -431,35 +706,41 @@ class MLXModel(BaseTextModel):
         except Exception as e:
             logger.error(f"Failed to generate completion: {str(e)}", exc_info=True)
             raise RuntimeError(f"Failed to generate completion: {str(e)}")
+        finally:
+            self._close_request_context(request, key, context, token)
 
     def stream_generate(
         self,
         request: ChatCompletionRequest,
     ) -> Generator[ChatCompletionChunk, None, None]:
+        key, context, token = self._open_request_context(request)
         try:
-            chat_id = f"chatcmpl-{uuid.uuid4().hex[:10]}"
+            chat_id = f"chatcmpl-{os.urandom(5).hex()}"
+            # One timestamp per response, as OpenAI does for every chunk
+            created = int(time.time())
+
+            # Track the completion for final processing, joined once at the end
+            completion_parts: List[str] = []
 
-            completion = ""
-            # Track the completion for final processing
-            full_completion = ""
-            
             for result in self._stream_generate(request=request):
-                created = int(time.time())
-                completion += result.text
-                full_completion += result.text
+                completion_parts.append(result.text)
 
                 # Simple streaming: only delta.content and delta.role
                 # No reasoning, no tool_calls in intermediate chunks
-                delta_message = ChatDelta(role=Role.ASSISTANT, content=result.text)
+                # All values are generated here, so per-token chunks skip
+                # validation with `model_construct`
+                delta_message = ChatDelta.model_construct(
+                    role=Role.ASSISTANT, content=result.text
+                )
 
                 # Always send finish_reason=None for intermediate chunks
-                yield ChatCompletionChunk(
+                yield ChatCompletionChunk.model_construct(
                     id=chat_id,
                     created=created,
                     model=request.model,
                     system_fingerprint=request.model,
                     choices=[
-                        ChatCompletionChunkChoice(
+                        ChatCompletionChunkChoice.model_construct(
                             index=0,
                             delta=delta_message,
                             finish_reason=None,  # Always None for intermediate chunks
@@ -469,14 +750,19 @@ class MLXModel(BaseTextModel):
                 )
 
             # Final chunk with actual finish_reason and processed content
-            created = int(time.time())
             final_finish_reason = "stop"
             final_delta = ChatDelta()  # Empty delta for final chunk
-            
+
+            full_completion = "".join(completion_parts)
+
             # Process final completion for reasoning and tool calls
-            enable_thinking = self._get_request_context().reasoning_decoder.enable_thinking
+            enable_thinking = (
+                self._get_request_context().reasoning_decoder.enable_thinking
+            )
             if enable_thinking:
-                reasoning_result = self._get_request_context().reasoning_decoder.decode(full_completion)
+                reasoning_result = (
+                    self._get_request_context().reasoning_decoder.finalize()
+                )
                 if reasoning_result:
                     logger.debug(f"Final reasoning result:\n{reasoning_result}")
                     full_completion = reasoning_result.get("content") or full_completion
@@ -496,7 +782,7 @@ class MLXModel(BaseTextModel):
                                 function=tool_call.function,
                             )
                             delta_tool_calls.append(delta_tool_call)
-                        
+
                         # Final chunk with tool_calls
                         final_delta = ChatDelta(tool_calls=delta_tool_calls)
                         final_finish_reason = "tool_calls"
@@ -520,7 +806,6 @@ class MLXModel(BaseTextModel):
             )
 
             if request.stream_options and request.stream_options.include_usage:
-                created = int(time.time())
                 cached_tokens = self._get_request_context().prompt_cache_tokens_count
                 logger.debug(f"Stream response with {cached_tokens} cached tokens")
 
@@ -558,3 +843,5 @@ class MLXModel(BaseTextModel):
         except Exception as e:
             logger.error(f"Error during stream generation: {str(e)}", exc_info=True)
             raise
+        finally:
+            self._close_request_context(request, key, context, token)
@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 from typing import List, Union
 
 import mlx.core as mx
@@ -10,15 +11,26 @@ from outlines.processors.structured import JSONLogitsProcessor
 from ..schema import ResponseFormat
 
 
+@lru_cache(maxsize=128)
+def _compile_json_processor(
+    schema_json: str, tokenizer: TokenizerWrapper
+) -> JSONLogitsProcessor:
+    """Build the schema guide once per (schema, tokenizer) pair.
+
+    `schema_json` keeps the declared key order: outlines emits object
+    properties in that order, so reordered schemas need guides of their own.
+    """
+    return JSONLogitsProcessor(schema_json, TransformerTokenizer(tokenizer._tokenizer))
+
+
 class OutlinesLogitsProcessor:
     processed_token_count: int = 0
 
     def __init__(self, tokenizer: TokenizerWrapper, response_format: ResponseFormat):
         json_schema = response_format.json_schema.schema_def
-        self.logits_processor = JSONLogitsProcessor(
-            json_schema,
-            TransformerTokenizer(tokenizer._tokenizer),
-        )
+        schema_json = json.dumps(json_schema)
+        # The cached processor tracks guide state, so each request gets a copy
+        self.logits_processor = _compile_json_processor(schema_json, tokenizer).copy()
 
     def _convert_to_numpy_int(
         self, tokens: Union[mx.array, List[int], None]
@@ -5,9 +5,13 @@ This module provides functionality for managing and optimizing model prompt cach
 to improve performance in multi-turn conversations.
 """
 
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
+import mlx.core as mx
+from mlx.utils import tree_flatten
 from mlx_lm.models.cache import (
     can_trim_prompt_cache,
     make_prompt_cache,
@@ -59,6 +63,16 @@ class PromptCache:
     model_key: str = ""
     cached_token_count: int = 0
 
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the arrays of all cache layers, including headroom."""
+        return sum(
+            leaf.nbytes
+            for layer in self.cache
+            for _, leaf in tree_flatten(list(vars(layer).values()))
+            if isinstance(leaf, mx.array)
+        )
+
     def extend_completion_cache(self, completion_tokens):
         self.tokens.extend(completion_tokens)
         self.cached_token_count += len(completion_tokens)
@@ -123,3 +137,118 @@ class PromptCache:
         self.cached_token_count = len(self.tokens) - len(prompt)
         logger.debug(f"Returning {len(prompt)} tokens for processing.")
         return prompt
+
+
+class PromptCachePool:
+    """
+    LRU pool of idle prompt caches shared across requests
+
+    Caches are indexed by chained hashes of fixed-size token blocks, so a new
+    prompt is matched against the longest cached prefix of any earlier request
+    (a shared system prompt, tool definitions, an earlier turn) instead of only
+    its own previous cache. A cache is checked out exclusively while a request
+    uses it and returned to the pool once generation completes.
+
+    Attributes:
+        capacity: Maximum number of idle caches kept
+        block_size: Number of tokens per indexed block
+        max_bytes: Maximum total size of the idle caches, 0 for no limit
+    """
+
+    def __init__(self, capacity: int = 4, block_size: int = 128, max_bytes: int = 0):
+        self.capacity = capacity
+        self.block_size = block_size
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, PromptCache]" = OrderedDict()
+        self._entry_blocks: Dict[int, List[Tuple[str, int]]] = {}
+        self._entry_bytes: Dict[int, int] = {}
+        self._total_bytes = 0
+        self._block_index: Dict[Tuple[str, int], Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _block_hashes(self, tokens: Sequence[int]) -> List[int]:
+        """Chained hash of every full block, each one covers the whole prefix."""
+        hashes = []
+        prefix_hash = 0
+        for start in range(0, len(tokens) - self.block_size + 1, self.block_size):
+            prefix_hash = hash(
+                (prefix_hash, tuple(tokens[start : start + self.block_size]))
+            )
+            hashes.append(prefix_hash)
+        return hashes
+
+    def _find(self, model_id: str, prompt: Sequence[int]) -> Optional[int]:
+        # Longest block-aligned prefix first, most recently used entry wins
+        for prefix_hash in reversed(self._block_hashes(prompt)):
+            candidates = self._block_index.get((model_id, prefix_hash))
+            if candidates:
+                for entry_id in reversed(self._entries):
+                    if entry_id in candidates:
+                        return entry_id
+
+        # Shorter than one block: compare the leading tokens directly
+        best_id, best_len = None, 0
+        head = prompt[: self.block_size]
+        for entry_id, cache in self._entries.items():
+            if cache.model_key != model_id:
+                continue
+            prefix_len = common_prefix_len(cache.tokens[: self.block_size], head)
+            if prefix_len >= best_len and prefix_len > 0:
+                best_id, best_len = entry_id, prefix_len
+        return best_id
+
+    def _remove(self, entry_id: int) -> PromptCache:
+        cache = self._entries.pop(entry_id)
+        self._total_bytes -= self._entry_bytes.pop(entry_id, 0)
+        for key in self._entry_blocks.pop(entry_id, []):
+            entries = self._block_index.get(key)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self._block_index[key]
+        return cache
+
+    def acquire(self, model_id: str, prompt: Sequence[int]) -> PromptCache:
+        """Check out the cache sharing the longest prefix with `prompt`.
+
+        Returns an empty PromptCache when nothing matches; it will be reset
+        for the model on the first `get_prompt_cache` call.
+        """
+        with self._lock:
+            entry_id = self._find(model_id, prompt)
+            if entry_id is None:
+                return PromptCache()
+            logger.debug(f"Reusing pooled prompt cache for model {model_id}")
+            return self._remove(entry_id)
+
+    def release(self, cache: PromptCache) -> None:
+        """Return a cache to the pool, evicting the least recently used ones."""
+        if not cache.tokens:
+            return
+
+        nbytes = cache.nbytes
+        with self._lock:
+            entry_id = id(cache)
+            if entry_id in self._entries:
+                self._remove(entry_id)
+
+            blocks = [
+                (cache.model_key, prefix_hash)
+                for prefix_hash in self._block_hashes(cache.tokens)
+            ]
+            self._entries[entry_id] = cache
+            self._entry_blocks[entry_id] = blocks
+            self._entry_bytes[entry_id] = nbytes
+            self._total_bytes += nbytes
+            for key in blocks:
+                self._block_index.setdefault(key, set()).add(entry_id)
+
+            while len(self._entries) > self.capacity or (
+                self.max_bytes and self._total_bytes > self.max_bytes
+            ):
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                logger.debug("Evicted least recently used prompt cache")
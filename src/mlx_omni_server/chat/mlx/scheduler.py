@@ -0,0 +1,230 @@
+"""
+Iteration-level Request Scheduling
+
+This module interleaves the decode steps of concurrent requests on a single
+worker thread, so a long generation no longer holds back every request that
+arrives after it.
+"""
+
+import copy
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generator, List, Optional
+
+import mlx.core as mx
+import mlx.nn as nn
+from mlx_lm.generate import GenerationResponse, generate_step
+from mlx_lm.tokenizer_utils import TokenizerWrapper
+
+from ...utils.logger import logger
+
+# Marks the end of a sequence's output queue
+_DONE = object()
+
+
+@dataclass
+class _Sequence:
+    """A request admitted to the scheduler"""
+
+    responses: Generator[GenerationResponse, None, None]
+    output: queue.Queue
+    # Applied to each response on the scheduler thread
+    transform: Optional[Callable[[GenerationResponse], GenerationResponse]] = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+
+class BatchingScheduler:
+    """Pool concurrent requests and advance them one decode step at a time.
+
+    New requests are collected for a short window before the first step so
+    that requests arriving together start together. Every active sequence
+    keeps its own prompt cache and detokenizer, and all model calls happen on
+    the scheduler thread.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        tokenizer: TokenizerWrapper,
+        window: float = 0.015,
+    ):
+        self._model = model
+        self._tokenizer = tokenizer
+        self._window = window
+        self._inbox: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="mlx-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        prompt: List[int],
+        transform: Optional[Callable[[GenerationResponse], GenerationResponse]] = None,
+        **kwargs: Any,
+    ) -> Generator[GenerationResponse, None, None]:
+        """Queue a request and yield its generation responses.
+
+        Accepts the same keyword arguments as `mlx_lm.generate.generate_step`.
+        `transform` runs on the scheduler thread before a response is handed
+        out, so it may touch the device. Closing the returned generator
+        cancels the request.
+        """
+        sequence = _Sequence(
+            responses=self._generate(prompt, **kwargs),
+            output=queue.Queue(),
+            transform=transform,
+        )
+        self._inbox.put(sequence)
+        try:
+            while True:
+                item = sequence.output.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            sequence.cancelled.set()
+
+    def _generate(
+        self, prompt: List[int], max_tokens: int = 256, **kwargs: Any
+    ) -> Generator[GenerationResponse, None, None]:
+        """Mirror of `mlx_lm.generate.stream_generate` with a private detokenizer.
+
+        The tokenizer's own detokenizer is a single shared instance, so each
+        sequence works on a reset copy of it.
+        """
+        tokenizer = self._tokenizer
+        detokenizer = copy.copy(tokenizer.detokenizer)
+        detokenizer.reset()
+
+        prompt = mx.array(prompt)
+        token_generator = generate_step(
+            prompt, self._model, max_tokens=max_tokens, **kwargs
+        )
+
+        tic = time.perf_counter()
+        prompt_tps = 0.0
+        n, token, logprobs = -1, None, None
+        for n, (token, logprobs) in enumerate(token_generator):
+            if n == 0:
+                prompt_time = time.perf_counter() - tic
+                prompt_tps = prompt.size / prompt_time
+                tic = time.perf_counter()
+            if token in tokenizer.eos_token_ids:
+                break
+
+            detokenizer.add_token(token)
+
+            yield GenerationResponse(
+                text=detokenizer.last_segment,
+                token=token,
+                logprobs=logprobs,
+                from_draft=False,
+                prompt_tokens=prompt.size,
+                prompt_tps=prompt_tps,
+                generation_tokens=n + 1,
+                generation_tps=(n + 1) / (time.perf_counter() - tic),
+                peak_memory=mx.get_peak_memory() / 1e9,
+                finish_reason=None,
+            )
+
+        detokenizer.finalize()
+        generation_tokens = n + 1
+        yield GenerationResponse(
+            text=detokenizer.last_segment,
+            token=token,
+            logprobs=logprobs,
+            from_draft=False,
+            prompt_tokens=prompt.size,
+            prompt_tps=prompt_tps,
+            generation_tokens=generation_tokens,
+            generation_tps=generation_tokens / (time.perf_counter() - tic),
+            peak_memory=mx.get_peak_memory() / 1e9,
+            finish_reason="stop" if token in tokenizer.eos_token_ids else "length",
+        )
+
+    def _admit_pending(self, active: List[_Sequence], block: bool) -> None:
+        """Move queued requests into the active set."""
+        if block:
+            # Idle: wait for a request, then give its peers a short window
+            active.append(self._inbox.get())
+            deadline = time.perf_counter() + self._window
+            while (remaining := deadline - time.perf_counter()) > 0:
+                try:
+                    active.append(self._inbox.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        else:
+            while True:
+                try:
+                    active.append(self._inbox.get_nowait())
+                except queue.Empty:
+                    break
+
+    def _step(self, sequence: _Sequence) -> bool:
+        """Advance a sequence by one response, returns False once it is done."""
+        try:
+            response = next(sequence.responses)
+            if sequence.transform is not None:
+                response = sequence.transform(response)
+        except StopIteration:
+            sequence.output.put(_DONE)
+            return False
+        except Exception as e:
+            logger.error(f"Scheduled generation failed: {str(e)}", exc_info=True)
+            sequence.output.put(e)
+            return False
+
+        sequence.output.put(response)
+        return True
+
+    def _fail(self, active: List[_Sequence], error: Exception) -> None:
+        """Hand `error` to every sequence that was on the scheduler."""
+        for sequence in active:
+            try:
+                sequence.responses.close()
+            except Exception:
+                pass
+            sequence.output.put(error)
+
+    def _iterate(self, active: List[_Sequence]) -> List[_Sequence]:
+        """Run one scheduling round and return the sequences still active."""
+        self._admit_pending(active, block=not active)
+
+        progressed = False
+        still_active = []
+        for sequence in active:
+            if sequence.cancelled.is_set():
+                sequence.responses.close()
+                continue
+            # Keep at most one response buffered per request so the KV
+            # cache never runs ahead of what the consumer has seen
+            if not sequence.output.empty():
+                still_active.append(sequence)
+                continue
+            progressed = True
+            if self._step(sequence):
+                still_active.append(sequence)
+
+        if still_active and not progressed:
+            # Every consumer is behind, wait for one of them or a new request
+            try:
+                still_active.append(self._inbox.get(timeout=0.001))
+            except queue.Empty:
+                pass
+        return still_active
+
+    def _run(self) -> None:
+        active: List[_Sequence] = []
+        while True:
+            try:
+                active = self._iterate(active)
+            except Exception as e:
+                # Fail the sequences in flight and keep serving new requests
+                logger.error(f"Scheduler round failed: {str(e)}", exc_info=True)
+                self._fail(active, e)
+                active = []
@@ -1,4 +1,6 @@
-from typing import List, NamedTuple, Optional, Union
+from array import array
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
 
 from mlx_lm.tokenizer_utils import TokenizerWrapper
 
@@ -26,7 +28,7 @@ class StopTokensChecker:
 
     def _prepare_stop_sequences(
         self, stop_words: Optional[Union[str, List[str]]], tokenizer: TokenizerWrapper
-    ) -> List[List[int]]:
+    ) -> List[array]:
         """Prepare stop sequences by converting words to token IDs.
 
         Args:
@@ -34,23 +36,25 @@ class StopTokensChecker:
             tokenizer: Tokenizer to use for encoding
 
         Returns:
-            List of token ID sequences
+            List of token ID sequences, as `array("i")` to compare against
+            the generated tokens directly
         """
         if not stop_words:
             return []
 
         words = [stop_words] if isinstance(stop_words, str) else stop_words
         return [
-            tokenizer.encode(word, add_special_tokens=False)
+            array("i", tokenizer.encode(word, add_special_tokens=False))
             for word in words
             if word  # Skip empty strings
         ]
 
-    def check_stop_condition(self, tokens: List[int]) -> StopCondition:
+    def check_stop_condition(self, tokens: Sequence[int]) -> StopCondition:
         """Check if the token sequence meets any custom stop criteria.
 
         Args:
-            tokens: The current sequence of generated tokens
+            tokens: The current sequence of generated tokens, ideally an
+                `array("i")`; other sequences are converted first
 
         Returns:
             StopCondition indicating if/how generation should stop
@@ -58,6 +62,9 @@ class StopTokensChecker:
         if not tokens or not self._stop_id_sequences:
             return StopCondition(stop_met=False, trim_length=0)
 
+        if not isinstance(tokens, array):
+            tokens = array("i", tokens)
+
         # Check stop sequences
         for stop_ids in self._stop_id_sequences:
             stop_len = len(stop_ids)
@@ -69,7 +76,7 @@ class StopTokensChecker:
         return StopCondition(stop_met=False, trim_length=0)
 
     @staticmethod
-    def _find_prefix_length(tokens: List[int], first_stop_token: int) -> int:
+    def _find_prefix_length(tokens: Sequence[int], first_stop_token: int) -> int:
         """Find length of matching prefix tokens.
 
         Args:
@@ -86,3 +93,22 @@ class StopTokensChecker:
             else:
                 break
         return prefix_len
+
+
+@lru_cache(maxsize=128)
+def _cached_stop_tokens_checker(
+    stop_words: Tuple[str, ...], tokenizer: TokenizerWrapper
+) -> StopTokensChecker:
+    return StopTokensChecker(list(stop_words), tokenizer)
+
+
+def get_stop_tokens_checker(
+    stop_words: Union[str, List[str]], tokenizer: TokenizerWrapper
+) -> StopTokensChecker:
+    """Return a shared checker, the stop words are only encoded once.
+
+    StopTokensChecker holds no per-request state, so instances can be reused
+    across requests with the same stop words and tokenizer.
+    """
+    words = (stop_words,) if isinstance(stop_words, str) else tuple(stop_words)
+    return _cached_stop_tokens_checker(words, tokenizer)
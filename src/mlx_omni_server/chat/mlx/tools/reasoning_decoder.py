@@ -29,12 +29,37 @@ class ReasoningDecoder(TokensDecoder):
     def __init__(self, tokenizer: TokenizerWrapper):
         self.tokenizer = tokenizer
         self.accumulated_text = ""
+        self._suffix_tag: Optional[str] = None
+        self._thinking_suffix = ""
+        self.reset()
+
+    @property
+    def thinking_suffix(self) -> str:
+        """Opening thinking tag, a prompt ends with it when the template pre-opens thinking."""
+        # Rebuilt only when `thinking_tag` changes
+        if self._suffix_tag != self.thinking_tag:
+            self._suffix_tag = self.thinking_tag
+            self._thinking_suffix = f"<{self.thinking_tag}>"
+        return self._thinking_suffix
+
+    def reset(self) -> None:
+        """Clear all per-generation state."""
+        self.accumulated_text = ""
+        # Incremental split maintained by `feed`: text before the start tag,
+        # inside the thinking block and after it
+        self._state = "before"
+        self._end_only = False
+        # Start of a thinking block found after a stray closing tag
+        self._pair_start = -1
+        self._before = ""
+        self._thinking = ""
+        self._after = ""
 
     def set_thinking_prefix(self, add_thinking_prefix: bool) -> None:
         self.add_thinking_prefix = add_thinking_prefix
-        self.accumulated_text = ""
+        self.reset()
         if add_thinking_prefix:
-            self.accumulated_text = f"<{self.thinking_tag}>"
+            self.accumulated_text = self.thinking_suffix
 
     def _parse_stream_response(self, text: str) -> Optional[Dict[str, Any]]:
         # Check if in thinking mode
@@ -122,6 +147,90 @@ class ReasoningDecoder(TokensDecoder):
                 "reasoning": None,
             }
 
+    def feed(self, delta: str) -> None:
+        """Add generated text to the incremental reasoning/content split.
+
+        Tags split across deltas are found by re-scanning only the last
+        `len(tag) - 1` characters of the previous text.
+        """
+        if not self.enable_thinking:
+            self._after += delta
+            return
+
+        start_tag = self.thinking_suffix
+        end_tag = f"</{self.thinking_tag}>"
+
+        if self._state == "before":
+            scan_from = max(0, len(self._before) - len(end_tag) + 1)
+            self._before += delta
+            start = self._before.find(start_tag, scan_from)
+            end = self._before.find(end_tag, scan_from)
+            if start != -1 and (end == -1 or start < end):
+                rest = self._before[start + len(start_tag) :]
+                self._before = self._before[:start]
+                self._state = "thinking"
+                self.feed(rest)
+            elif end != -1:
+                # Closing tag without an opening one: everything so far was reasoning
+                self._thinking = self._before[:end]
+                self._after = self._before[end + len(end_tag) :]
+                self._before = ""
+                self._end_only = True
+                self._state = "after"
+                self._match_pair(0)
+        elif self._state == "thinking":
+            scan_from = max(0, len(self._thinking) - len(end_tag) + 1)
+            self._thinking += delta
+            end = self._thinking.find(end_tag, scan_from)
+            if end != -1:
+                self._after = self._thinking[end + len(end_tag) :]
+                self._thinking = self._thinking[:end]
+                self._state = "after"
+        else:
+            scan_from = max(0, len(self._after) - len(end_tag) + 1)
+            self._after += delta
+            if self._end_only:
+                self._match_pair(scan_from)
+
+    def _match_pair(self, scan_from: int) -> None:
+        """Look for a complete thinking block after a stray closing tag.
+
+        `decode` prefers a full block anywhere in the text over splitting at
+        the stray tag, so once one closes the split is redone around it.
+        """
+        start_tag = self.thinking_suffix
+        end_tag = f"</{self.thinking_tag}>"
+        if self._pair_start == -1:
+            self._pair_start = self._after.find(start_tag, scan_from)
+            if self._pair_start == -1:
+                return
+        scan_from = max(scan_from, self._pair_start + len(start_tag))
+        end = self._after.find(end_tag, scan_from)
+        if end == -1:
+            return
+        self._before = self._thinking + end_tag + self._after[: self._pair_start]
+        self._thinking = self._after[self._pair_start + len(start_tag) : end]
+        self._after = self._after[end + len(end_tag) :]
+        self._end_only = False
+
+    def finalize(self) -> Optional[Dict[str, Any]]:
+        """Result of `decode` over everything passed to `feed`, without rescanning it."""
+        if not self.enable_thinking:
+            return {"content": self._after}
+
+        if self._state == "before":
+            return {"content": self._before.strip(), "reasoning": None}
+        if self._state == "thinking":
+            # Thinking block never closed, the text is kept as-is
+            content = self._before + self.thinking_suffix + self._thinking
+            return {"content": content.strip(), "reasoning": None}
+        if self._end_only:
+            return {"content": self._after.strip(), "reasoning": self._thinking.strip()}
+        return {
+            "content": (self._before + self._after).strip(),
+            "reasoning": self._thinking.strip(),
+        }
+
     def decode(self, text: str) -> Optional[Dict[str, Any]]:
         """Parse thinking content from model output"""
         if self.enable_thinking:
@@ -1,4 +1,7 @@
 import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Dict, Any
 from uuid import uuid4
 
@@ -11,19 +14,43 @@ class ModelLoader:
     def __init__(self) -> None:
         self._tasks: Dict[str, asyncio.Task] = {}
         self._status: Dict[str, Dict[str, Any]] = {}
+        # model_id -> task_id of the download currently in progress
+        self._active: Dict[str, str] = {}
+
+        # Bound parallel downloads so they don't saturate disk/network or
+        # contend on the HF cache lock
+        concurrency = max(1, int(os.getenv("MLX_MODEL_DOWNLOAD_CONCURRENCY", "2")))
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="hf-dl"
+        )
 
     async def _download(self, model_id: str, task_id: str) -> None:
         try:
-            await asyncio.to_thread(snapshot_download, repo_id=model_id)
+            async with self._semaphore:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, partial(snapshot_download, repo_id=model_id)
+                )
             self._status[task_id]["status"] = "completed"
         except Exception as e:  # pragma: no cover - network operations
             self._status[task_id]["status"] = "failed"
             self._status[task_id]["error"] = str(e)
+        finally:
+            self._active.pop(model_id, None)
+            self._tasks.pop(task_id, None)
 
     def start(self, model_id: str) -> str:
-        """Start downloading a model in the background."""
+        """Start downloading a model in the background.
+
+        If the same model is already being downloaded, the id of the existing
+        task is returned instead of starting a second download.
+        """
+        if model_id in self._active:
+            return self._active[model_id]
+
         task_id = uuid4().hex
         self._status[task_id] = {"status": "in_progress", "model": model_id}
+        self._active[model_id] = task_id
         self._tasks[task_id] = asyncio.create_task(self._download(model_id, task_id))
         return task_id
 
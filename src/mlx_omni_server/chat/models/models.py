@@ -1,5 +1,8 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Request
 
+from ...utils.logger import logger
 from .model_loader import ModelLoader
 from .models_service import ModelsService
 from .schema import (
@@ -23,12 +26,19 @@ def extract_model_id_from_path(request: Request) -> str:
     return path[len(prefix) :]
 
 
+# Exception type -> HTTP status, anything else is a 500
+_ERROR_STATUS = {ValueError: 404}
+
+
 def handle_model_error(e: Exception) -> None:
     """Handle model-related errors and raise appropriate HTTP exceptions"""
-    if isinstance(e, ValueError):
-        raise HTTPException(status_code=404, detail=str(e))
-    print(f"Error processing request: {str(e)}")
-    raise HTTPException(status_code=500, detail=str(e))
+    # Walk the MRO so subclasses map like their base, as isinstance would
+    status_code = next(
+        (_ERROR_STATUS[cls] for cls in type(e).__mro__ if cls in _ERROR_STATUS), 500
+    )
+    if status_code == 500:
+        logger.exception(f"Error processing request: {str(e)}")
+    raise HTTPException(status_code=status_code, detail=str(e)) from e
 
 
 @router.get("/models", response_model=ModelList)
@@ -38,6 +48,7 @@ async def list_models() -> ModelList:
     Lists the currently available models, and provides basic information about each one
     such as the owner and availability.
     """
+    # Served from the in-memory scan result, no disk access to offload
     try:
         return models_service.list_models()
     except Exception as e:
@@ -50,7 +61,7 @@ async def rescan_models() -> ModelList:
     Rescan the local cache for models.
     """
     try:
-        models_service._scan_models()
+        await asyncio.to_thread(models_service._scan_models)
         return models_service.list_models()
     except Exception as e:
         handle_model_error(e)
@@ -64,7 +75,7 @@ async def get_model(request: Request) -> Model:
     """
     try:
         model_id = extract_model_id_from_path(request)
-        model = models_service.get_model(model_id)
+        model = await asyncio.to_thread(models_service.get_model, model_id)
         if model is None:
             raise ValueError(f"Model '{model_id}' not found")
         return model
@@ -80,7 +91,7 @@ async def delete_model(request: Request) -> ModelDeletion:
     """
     try:
         model_id = extract_model_id_from_path(request)
-        return models_service.delete_model(model_id)
+        return await asyncio.to_thread(models_service.delete_model, model_id)
     except Exception as e:
         handle_model_error(e)
 
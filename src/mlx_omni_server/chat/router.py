@@ -1,18 +1,81 @@
-import json
 import asyncio
+import concurrent.futures
 import contextvars
-from typing import Generator, Dict
+import threading
+from typing import AsyncGenerator, Dict
 from contextlib import asynccontextmanager
 
+import orjson
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from .mlx.models import load_model
-from .schema import ChatCompletionRequest, ChatCompletionResponse
+from .schema import (
+    ChatCompletionChoice,
+    ChatCompletionChunk,
+    ChatCompletionChunkChoice,
+    ChatCompletionRequest,
+    ChatCompletionResponse,
+    ChatCompletionUsage,
+    ChatDelta,
+    ChatMessage,
+    Role,
+)
 from .text_models import BaseTextModel
 
 router = APIRouter(tags=["chat—completions"])
 
+# Pre-encoded SSE framing
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+
+def _sse_event(payload: bytes) -> bytes:
+    return b"".join((_SSE_PREFIX, payload, _SSE_SUFFIX))
+
+
+def _warm_up_schemas() -> None:
+    """Run one validation and serialization per chat model at import.
+
+    Pydantic builds validators and serializers with the class, but the first
+    call through each path still pays one-off setup costs; pay them here
+    rather than on the first request.
+    """
+    ChatCompletionRequest.model_validate(
+        {"model": "warmup", "messages": [{"role": "user", "content": "warmup"}]}
+    )
+
+    chunk = ChatCompletionChunk(
+        id="warmup",
+        created=0,
+        model="warmup",
+        choices=[
+            ChatCompletionChunkChoice(
+                index=0, delta=ChatDelta(role=Role.ASSISTANT, content="warmup")
+            )
+        ],
+    )
+    chunk.__pydantic_serializer__.to_json(chunk, exclude_none=True)
+
+    completion = ChatCompletionResponse(
+        id="warmup",
+        created=0,
+        model="warmup",
+        choices=[
+            ChatCompletionChoice(
+                index=0,
+                message=ChatMessage(role=Role.ASSISTANT, content="warmup"),
+                finish_reason="stop",
+            )
+        ],
+        usage=ChatCompletionUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+    )
+    completion.__pydantic_serializer__.to_json(completion, exclude_none=True)
+
+
+_warm_up_schemas()
+
 
 class ModelManager:
     """Thread-safe model manager for handling concurrent requests"""
@@ -64,15 +127,43 @@ async def create_chat_completion(request: ChatCompletionRequest = None):
     )
 
     if not request.stream:
-        completion = text_model.generate(request)
-        return JSONResponse(content=completion.model_dump(exclude_none=True))
+        # Generation blocks, run it on a worker thread (context is copied)
+        completion = await asyncio.to_thread(text_model.generate, request)
+        # Serialize straight to JSON bytes, no intermediate dict
+        return Response(
+            content=completion.__pydantic_serializer__.to_json(
+                completion, exclude_none=True
+            ),
+            media_type="application/json",
+        )
+
+    loop = asyncio.get_running_loop()
+    # Bounded hand-off from the generating thread, so a slow client applies
+    # backpressure instead of buffering the whole completion
+    queue: asyncio.Queue = asyncio.Queue(maxsize=32)
+    cancelled = threading.Event()
 
-    async def event_generator() -> Generator[str, None, None]:
+    def put(item) -> bool:
+        """Hand an item to the event loop, giving up once the client is gone."""
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if cancelled.is_set():
+                    future.cancel()
+                    return False
+
+    def produce() -> None:
+        chunks = text_model.stream_generate(request)
         try:
-            for chunk in text_model.stream_generate(request):
-                chunk_data = f"data: {json.dumps(chunk.model_dump(exclude_none=True))}\n\n"
-                yield chunk_data
-                # Force flush by yielding immediately
+            for chunk in chunks:
+                payload = chunk.__pydantic_serializer__.to_json(
+                    chunk, exclude_none=True
+                )
+                if cancelled.is_set() or not put(_sse_event(payload)):
+                    break
         except Exception as e:
             # Send error as Server-Sent Event
             error_data = {
@@ -82,15 +173,30 @@ async def create_chat_completion(request: ChatCompletionRequest = None):
                     "code": 500
                 }
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            put(_sse_event(orjson.dumps(error_data)))
+        finally:
+            # Stop generation right away when the client has disconnected
+            chunks.close()
+            put(None)
+
+    async def event_generator() -> AsyncGenerator[bytes, None]:
+        # Events are sent as bytes, so StreamingResponse skips re-encoding them
+        loop.run_in_executor(None, contextvars.copy_context().run, produce)
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
         finally:
-            yield "data: [DONE]\n\n"
+            cancelled.set()
+        yield _SSE_DONE
 
     return StreamingResponse(
         event_generator(),
-        media_type="text/event-stream",
+        media_type="text/event-stream; charset=utf-8",
         headers={
-            "Cache-Control": "no-cache",
+            # Keep reverse proxies (nginx in particular) from buffering or
+            # re-encoding the event stream
+            "Cache-Control": "no-cache, no-transform",
+            "X-Accel-Buffering": "no",
             "Connection": "keep-alive",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
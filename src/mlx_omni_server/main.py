@@ -1,5 +1,6 @@
 import argparse
 import os
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
@@ -7,8 +8,17 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .middleware.logging import RequestResponseLoggingMiddleware
 from .routers import api_router
+from .stt.stt import warm_up_stt_model
 
-app = FastAPI(title="MLX Omni Server")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up models before the server starts accepting requests."""
+    await warm_up_stt_model()
+    yield
+
+
+app = FastAPI(title="MLX Omni Server", lifespan=lifespan)
 
 # Add CORS middleware for streaming support
 app.add_middleware(
@@ -1,4 +1,5 @@
 from enum import Enum
+from functools import cached_property
 from typing import List, Optional
 
 from fastapi import File, Form, UploadFile
@@ -75,6 +76,9 @@ class STTRequestForm:
     ):
         self.file = file
         self.model = model
+        # Backend is chosen once here; the model may also be a path to a
+        # whisper.cpp .bin file, so a prefix check is not enough
+        self.use_whisper_cpp = "whisper.cpp" in model
         self.language = language
         self.prompt = prompt
         self.response_format = response_format
@@ -97,6 +101,11 @@ class STTRequestForm:
 
         self.validate()
 
+    @cached_property
+    def wants_word_timestamps(self) -> bool:
+        """Whether word-level timestamps were requested"""
+        return TimestampGranularity.WORD in self.timestamp_granularities
+
     def validate(self):
         # Validate file extension
         allowed_extensions = {
@@ -128,8 +137,7 @@ class STTRequestForm:
 
         # 验证 word 时间戳必须使用 verbose_json
         if (
-            self.timestamp_granularities
-            and TimestampGranularity.WORD in self.timestamp_granularities
+            self.wants_word_timestamps
             and self.response_format != ResponseFormat.VERBOSE_JSON
         ):
             raise ValueError(
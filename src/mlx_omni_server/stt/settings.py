@@ -0,0 +1,41 @@
+import os
+from dataclasses import dataclass, fields
+
+
+@dataclass(frozen=True)
+class STTSettings:
+    """Speech-to-text configuration.
+
+    Every field is read from the environment variable of the same name in
+    upper case, once at import, so request handling only reads typed
+    attributes.
+    """
+
+    whisper_cpp_cli: str = "./whisper.cpp/build/bin/whisper-cli"
+    whisper_cpp_model: str = "./whisper.cpp/models/ggml-large-v3.bin"
+    whisper_cpp_vad_model: str = "./whisper.cpp/models/ggml-silero-v5.1.2.bin"
+    whisper_cpp_threads: int = 32
+    whisper_cpp_max_workers: int = 4
+    whisper_cpp_capture_stdout: bool = False
+    whisper_cpp_stdin_max_mb: float = 25.0
+    stt_max_concurrency: int = 1
+    stt_model_cache: int = 2
+    stt_batch: int = 1
+    stt_batch_wait_ms: float = 20.0
+    stt_warmup_model: str = ""
+
+    @classmethod
+    def from_env(cls) -> "STTSettings":
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(field.name.upper())
+            if raw is None:
+                continue
+            if field.type is bool:
+                values[field.name] = raw == "1"
+            else:
+                values[field.name] = field.type(raw)
+        return cls(**values)
+
+
+settings = STTSettings.from_env()
@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse, Response
 from starlette.responses import PlainTextResponse
 
 from .schema import ResponseFormat, STTRequestForm, TranscriptionResponse
+from .settings import settings
 from .whisper_model import STTService
 
 router = APIRouter(tags=["speech-to-text"])
@@ -10,6 +11,12 @@ router = APIRouter(tags=["speech-to-text"])
 stt_service = STTService()
 
 
+async def warm_up_stt_model():
+    """Load the MLX Whisper model named by STT_WARMUP_MODEL, if any."""
+    if settings.stt_warmup_model:
+        await stt_service.warmup(settings.stt_warmup_model)
+
+
 @router.post("/audio/transcriptions", response_model=TranscriptionResponse)
 @router.post("/v1/audio/transcriptions", response_model=TranscriptionResponse)
 async def create_transcription(request: STTRequestForm = Depends()):
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import queue
+import tempfile
+from pathlib import Path
+
+from fastapi import UploadFile
+
+# Аудио живёт несколько секунд, поэтому по возможности кладём его в tmpfs.
+# /dev/shm есть только в Linux; в macOS tmpfs по умолчанию нет, и файлы
+# попадают в обычный каталог tempfile.gettempdir() (в /var/folders на диске)
+TMPDIR = (
+    "/dev/shm"
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK)
+    else tempfile.gettempdir()
+)
+
+# Размер блока при копировании загруженного аудио на диск
+_CHUNK_SIZE = 64 * 1024
+
+# Переиспользуемые буферы: копирование не выделяет память на каждый запрос
+_UPLOAD_BUF_POOL: queue.SimpleQueue = queue.SimpleQueue()
+
+
+def _acquire() -> bytearray:
+    try:
+        return _UPLOAD_BUF_POOL.get_nowait()
+    except queue.Empty:
+        return bytearray(_CHUNK_SIZE)
+
+
+def _release(buf: bytearray) -> None:
+    _UPLOAD_BUF_POOL.put(buf)
+
+
+def _copy_to_temp(source, suffix: str) -> str:
+    """Скопировать файл блоками во временный файл и вернуть его путь"""
+    buf = _acquire()
+    try:
+        with memoryview(buf) as view, tempfile.NamedTemporaryFile(
+            delete=False, suffix=suffix, dir=TMPDIR
+        ) as tmp:
+            while n := source.readinto(view):
+                tmp.write(view[:n])
+            return tmp.name
+    finally:
+        _release(buf)
+
+
+def write_temp_file(data: bytes, suffix: str) -> str:
+    """Записать данные во временный файл и вернуть его путь"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=TMPDIR) as tmp:
+        tmp.write(data)
+        return tmp.name
+
+
+async def save_upload_file(file: UploadFile) -> str:
+    """Сохранить загруженный файл во временный файл без чтения целиком в память"""
+    suffix = Path(file.filename).suffix
+    return await asyncio.to_thread(_copy_to_temp, file.file, suffix)
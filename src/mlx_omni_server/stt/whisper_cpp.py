@@ -1,12 +1,21 @@
 import asyncio
-import json
+import atexit
+import io
 import logging
 import os
 import re
+import shutil
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import List, Union
+from typing import List, Optional, Set, Union
+
+import orjson
+
+try:
+    import soundfile
+except ImportError:  # ставится вместе с аудио-зависимостями
+    soundfile = None
 
 from .schema import (
     ResponseFormat,
@@ -14,6 +23,50 @@ from .schema import (
     TranscriptionResponse,
     TranscriptionWord,
 )
+from .settings import settings
+from .upload import TMPDIR, save_upload_file, write_temp_file
+
+# Строка stdout вида [00:00:00.940 --> 00:00:01.410]   Hello?
+# Часы, минуты и секунды захватываются отдельно, без split(":")
+_TIMESTAMP_LINE = re.compile(
+    r"\[(\d{2}):(\d{2}):(\d{2}\.\d{3}) --> (\d{2}):(\d{2}):(\d{2}\.\d{3})\]\s+(.*)"
+)
+
+# stdout whisper.cpp нужен только для диагностики: результат всегда пишется
+# в JSON, поэтому по умолчанию вывод не передаётся через pipe
+_CAPTURE_STDOUT = settings.whisper_cpp_capture_stdout
+
+_EMPTY_OFFSETS: dict = {}
+
+# Сборки whisper-cli, которые не читают аудио из stdin. Старые версии
+# принимают "-" за имя файла и не находят его; решение принимается один раз
+# на путь к CLI, ошибки декодирования самого аудио на него не влияют
+_NO_STDIN_CLIS: Set[str] = set()
+_STDIN_UNSUPPORTED_ERRORS = (b"input file not found '-'", b"failed to open '-'")
+
+# Параметры декодирования в зависимости от длительности аудио
+_SHORT_AUDIO_ARGS = ("--best-of", "5", "--beam-size", "5")
+_LONG_AUDIO_ARGS = (
+    "--best-of",
+    "3",
+    "--beam-size",
+    "3",
+    "--max-context",
+    "0",
+    "--entropy-thold",
+    "2.5",
+)
+
+
+def _format_timestamp(seconds: float, separator: str = ".") -> str:
+    """Время в формате HH:MM:SS.mmm (для SRT разделитель - запятая)"""
+    # Целые миллисекунды: без замены символов в готовой строке и без
+    # "60.000" в секундах при округлении
+    ms = round(seconds * 1000)
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{ms:03d}"
 
 
 class WhisperCppModel:
@@ -38,15 +91,74 @@ class WhisperCppModel:
         if not os.path.exists(self.vad_model_path):
             logging.warning(f"VAD model not found at: {self.vad_model_path}")
 
+        # Экземпляр обслуживает один запрос за раз (пул в STTService), поэтому
+        # рабочая папка создаётся один раз, а выходные файлы перезаписываются
+        self._workdir = tempfile.mkdtemp(prefix="whisper_cpp_", dir=TMPDIR)
+        self._json_path = os.path.join(self._workdir, "output.json")
+        atexit.register(shutil.rmtree, self._workdir, ignore_errors=True)
+
+        # Аргументы, не зависящие от запроса, собираются один раз
+        self._has_vad = os.path.exists(self.vad_model_path)
+        self._cmd_prefix = (
+            self.whisper_cli_path,
+            # Основные параметры
+            "--threads",
+            str(self.threads),
+            # Параметры декодирования
+            "--word-thold",
+            "0.005",
+            "--no-speech-thold",
+            "0.4",
+            # Контекст и длина
+            "--max-len",
+            "448",
+            # Дополнительные улучшения
+            "--suppress-nst",
+            "--flash-attn",
+            # Вывод JSON
+            "--output-json",
+            "--output-file",
+            os.path.join(self._workdir, "output"),
+            # Не печатать цвета в stdout
+            "--no-prints",
+            # VAD параметры (если модель существует)
+            *(
+                (
+                    "--vad",
+                    "--vad-model",
+                    self.vad_model_path,
+                    "--vad-threshold",
+                    "0.3",
+                    "--vad-min-speech-duration-ms",
+                    "200",
+                    "--vad-min-silence-duration-ms",
+                    "300",
+                    "--vad-speech-pad-ms",
+                    "50",
+                )
+                if self._has_vad
+                else ()
+            ),
+        )
+
     async def _save_upload_file(self, file) -> str:
-        suffix = Path(file.filename).suffix
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            return tmp.name
+        return await save_upload_file(file)
+
+    @property
+    def reads_stdin(self) -> bool:
+        """Читает ли эта сборка whisper.cpp аудио из stdin"""
+        return self.whisper_cli_path not in _NO_STDIN_CLIS
 
     def _get_audio_duration(self, file_path: str) -> float:
         """Получить длительность аудиофайла в секундах"""
+        # Чтение заголовка без отдельного процесса; ffprobe нужен только
+        # для форматов, которые libsndfile не открывает (mp3, m4a, ...)
+        if soundfile is not None:
+            try:
+                return soundfile.info(file_path).duration
+            except Exception:
+                pass
+
         try:
             result = subprocess.run(
                 [
@@ -66,11 +178,24 @@ class WhisperCppModel:
         except:
             return 0
 
+    def _get_bytes_duration(self, data: bytes) -> Optional[float]:
+        """Длительность аудио в памяти или None, если заголовок не распознан"""
+        if soundfile is None:
+            return None
+        try:
+            return soundfile.info(io.BytesIO(data)).duration
+        except Exception:
+            return None
+
     def _build_whisper_command(
-        self, audio_path: str, request: STTRequestForm, temp_dir: str
+        self,
+        audio_path: str,
+        request: STTRequestForm,
+        duration_seconds: Optional[float] = None,
     ) -> List[str]:
         """Построить команду для whisper.cpp"""
-        duration_seconds = self._get_audio_duration(audio_path)
+        if duration_seconds is None:
+            duration_seconds = self._get_audio_duration(audio_path)
         duration_minutes = duration_seconds / 60
 
         # Определяем путь к модели (из request или по умолчанию)
@@ -79,93 +204,29 @@ class WhisperCppModel:
             # Если передан путь к .bin файлу, используем его
             model_path = request.model
 
-        # Базовое имя для выходных файлов (без расширения)
-        output_base = os.path.join(temp_dir, "output")
-
         cmd = [
-            self.whisper_cli_path,
-            # Основные параметры
-            "--threads",
-            str(self.threads),
+            *self._cmd_prefix,
             "--model",
             model_path,
             "--file",
             audio_path,
-            # Параметры декодирования
             "--temperature",
             str(request.temperature) if request.temperature else "0.2",
-            "--word-thold",
-            "0.005",
-            "--no-speech-thold",
-            "0.4",
-            # Контекст и длина
-            "--max-len",
-            "448",
-            # Дополнительные улучшения
-            "--suppress-nst",
-            "--flash-attn",
-            # Вывод JSON
-            "--output-json",
-            "--output-file",
-            output_base,
-            # Не печатать цвета в stdout
-            "--no-prints",
         ]
 
-        # VAD параметры (если модель существует)
-        if os.path.exists(self.vad_model_path):
-            cmd.extend(
-                [
-                    "--vad",
-                    "--vad-model",
-                    self.vad_model_path,
-                    "--vad-threshold",
-                    "0.3",
-                    "--vad-min-speech-duration-ms",
-                    "200",
-                    "--vad-min-silence-duration-ms",
-                    "300",
-                    "--vad-speech-pad-ms",
-                    "50",
-                ]
-            )
-
         # Язык
         if request.language:
-            cmd.extend(["--language", request.language])
+            cmd += ("--language", request.language)
 
         # Prompt
         if request.prompt:
-            cmd.extend(["--prompt", request.prompt])
+            cmd += ("--prompt", request.prompt)
 
         # Параметры в зависимости от длительности
-        if duration_minutes < 5:
-            cmd.extend(
-                [
-                    "--best-of",
-                    "5",
-                    "--beam-size",
-                    "5",
-                ]
-            )
-        else:
-            cmd.extend(
-                [
-                    "--best-of",
-                    "3",
-                    "--beam-size",
-                    "3",
-                    "--max-context",
-                    "0",
-                    "--entropy-thold",
-                    "2.5",
-                ]
-            )
+        cmd += _SHORT_AUDIO_ARGS if duration_minutes < 5 else _LONG_AUDIO_ARGS
 
         # Временные метки для слов
-        if request.timestamp_granularities and "word" in [
-            g.value for g in request.timestamp_granularities
-        ]:
+        if request.wants_word_timestamps:
             cmd.append("--word-timestamps")
             # Также добавим full JSON для получения слов
             cmd.append("--output-json-full")
@@ -181,14 +242,12 @@ class WhisperCppModel:
         full_text = []
 
         for i, line in enumerate(lines):
-            match = re.match(
-                r"\[(\d{2}:\d{2}:\d{2}\.\d{3}) --> (\d{2}:\d{2}:\d{2}\.\d{3})\]\s+(.*)",
-                line,
-            )
+            match = _TIMESTAMP_LINE.match(line)
             if match:
-                start_time = self._time_to_seconds(match.group(1))
-                end_time = self._time_to_seconds(match.group(2))
-                text = match.group(3).strip()
+                start_h, start_m, start_s, end_h, end_m, end_s, text = match.groups()
+                start_time = int(start_h) * 3600 + int(start_m) * 60 + float(start_s)
+                end_time = int(end_h) * 3600 + int(end_m) * 60 + float(end_s)
+                text = text.strip()
 
                 full_text.append(text)
 
@@ -202,170 +261,200 @@ class WhisperCppModel:
                 result["segments"].append(segment)
 
         result["text"] = " ".join(full_text)
+        # Сегменты идут по порядку, длительность - конец последнего
+        segments = result["segments"]
+        result["duration"] = segments[-1]["end"] if segments else 0.0
         return result
 
-    def _time_to_seconds(self, time_str: str) -> float:
-        """Конвертация времени вида 00:00:00.000 в секунды"""
-        parts = time_str.split(":")
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds = float(parts[2])
-        return hours * 3600 + minutes * 60 + seconds
-
     def _parse_whisper_output(self, json_path: str) -> dict:
         """Парсинг JSON вывода whisper.cpp"""
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = orjson.loads(Path(json_path).read_bytes())
 
         transcription = data.get("transcription", [])
 
-        # Собираем весь текст
-        full_text = " ".join(
-            seg.get("text", "").strip() for seg in transcription if seg.get("text")
-        )
+        # Текст и сегменты собираем за один проход
+        full_text = []
+        segments = []
+        append_text = full_text.append
+        append_segment = segments.append
+        for idx, segment in enumerate(transcription):
+            get = segment.get
+            text = get("text", "")
+            if text:
+                append_text(text.strip())
+
+            # offsets читаем один раз на сегмент
+            offsets = get("offsets") or _EMPTY_OFFSETS
+            append_segment(
+                {
+                    "id": idx,
+                    "start": offsets.get("from", 0.0) / 1000,
+                    "end": offsets.get("to", 0.0) / 1000,
+                    "text": text,
+                    "words": [],  # whisper.cpp может не давать по-словной разбивки
+                }
+            )
 
-        result = {
-            "text": full_text,
+        return {
+            "text": " ".join(full_text),
             "language": data.get("result", {}).get(
                 "language", ""
             ),  # из вложенного поля
-            "segments": [],
+            "segments": segments,
+            # Сегменты идут по порядку, длительность - конец последнего
+            "duration": segments[-1]["end"] if segments else 0.0,
         }
 
-        # Обрабатываем сегменты
-        for idx, segment in enumerate(transcription):
-            start_time = segment.get("offsets", {}).get("from", 0.0) / 1000
-            end_time = segment.get("offsets", {}).get("to", 0.0) / 1000
-
-            seg = {
-                "id": idx,
-                "start": start_time,
-                "end": end_time,
-                "text": segment.get("text", ""),
-                "words": [],  # whisper.cpp может не давать по-словной разбивки
-            }
-
-            result["segments"].append(seg)
+    def _collect_output(
+        self, returncode: int, stdout: Optional[bytes], stderr: Optional[bytes]
+    ) -> dict:
+        """Прочитать результат из рабочей папки и удалить выходные файлы
 
-        return result
-
-    def generate(self, audio_path: str, request: STTRequestForm) -> dict:
-        """Транскрибация через whisper.cpp"""
-        temp_dir = tempfile.mkdtemp()
+        stdout и stderr приходят как сырые байты и декодируются только
+        тогда, когда они действительно нужны.
+        """
         try:
-            # Строим команду
-            cmd = self._build_whisper_command(audio_path, request, temp_dir)
-
-            # Запускаем whisper.cpp
-            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-
-            # Проверяем, какие файлы были созданы
-            files_created = os.listdir(temp_dir)
-
             # Ищем JSON файл - должен быть output.json
-            json_path = os.path.join(temp_dir, "output.json")
-
-            if os.path.exists(json_path):
-                return self._parse_whisper_output(json_path)
-            else:
-                # Если JSON не создан, но процесс завершился успешно
-                if result.returncode == 0:
-                    # Попробуем найти любой JSON файл
-                    json_files = [f for f in files_created if f.endswith(".json")]
-                    if json_files:
-                        json_path = os.path.join(temp_dir, json_files[0])
+            if os.path.exists(self._json_path):
+                return self._parse_whisper_output(self._json_path)
+
+            # Если JSON не создан, но процесс завершился успешно
+            if returncode == 0:
+                # Попробуем найти любой JSON файл
+                json_files = [
+                    f for f in os.listdir(self._workdir) if f.endswith(".json")
+                ]
+                if json_files:
+                    json_path = os.path.join(self._workdir, json_files[0])
+                    try:
                         return self._parse_whisper_output(json_path)
-
-                    # Если JSON файлов нет, но есть stdout, парсим его
-                    if result.stdout:
-                        return self._parse_stdout_output(result.stdout)
-
-                raise Exception(
-                    f"Whisper.cpp failed with code {result.returncode}: {result.stderr}"
-                )
-
-        except Exception as e:
-            raise e
+                    finally:
+                        Path(json_path).unlink(missing_ok=True)
+
+                # Если JSON файлов нет, но stdout сохранён
+                # (WHISPER_CPP_CAPTURE_STDOUT=1), парсим его
+                if stdout:
+                    return self._parse_stdout_output(
+                        stdout.decode("utf-8", errors="replace")
+                    )
+
+            stderr_text = stderr.decode("utf-8", errors="replace") if stderr else ""
+            raise Exception(f"Whisper.cpp failed with code {returncode}: {stderr_text}")
         finally:
-            # Очищаем временные файлы
-            import shutil
+            # Удаляем только выходной файл, сама папка переиспользуется
+            Path(self._json_path).unlink(missing_ok=True)
 
-            shutil.rmtree(temp_dir, ignore_errors=True)
+    def generate(self, audio_path: str, request: STTRequestForm) -> dict:
+        """Транскрибация через whisper.cpp"""
+        # Строим команду
+        cmd = self._build_whisper_command(audio_path, request)
+
+        # Запускаем whisper.cpp
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE if _CAPTURE_STDOUT else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+
+        return self._collect_output(result.returncode, result.stdout, result.stderr)
 
     async def generate_async(self, audio_path: str, request: STTRequestForm) -> dict:
         """Асинхронная транскрибация через whisper.cpp"""
-        temp_dir = tempfile.mkdtemp()
-        try:
-            cmd = self._build_whisper_command(audio_path, request, temp_dir)
+        # Оценка длительности и разбор JSON работают с диском, поэтому
+        # выполняются в потоке, не блокируя event loop
+        cmd = await asyncio.to_thread(self._build_whisper_command, audio_path, request)
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=(
+                asyncio.subprocess.PIPE
+                if _CAPTURE_STDOUT
+                else asyncio.subprocess.DEVNULL
+            ),
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate()
+
+        return await asyncio.to_thread(
+            self._collect_output, process.returncode, stdout, stderr
+        )
 
+    async def generate_from_bytes_async(
+        self, data: bytes, request: STTRequestForm, suffix: str = ""
+    ) -> dict:
+        """Транскрибация аудио из памяти: whisper.cpp читает его из stdin
+
+        Если длительность не определить без ffprobe или сборка whisper.cpp
+        не читает stdin, аудио сохраняется во временный файл. Ошибка
+        распознавания самого аудио возвращается сразу, без второго запуска.
+        """
+        duration_seconds = None
+        if self.reads_stdin:
+            duration_seconds = await asyncio.to_thread(self._get_bytes_duration, data)
+
+        if duration_seconds is not None:
+            cmd = self._build_whisper_command("-", request, duration_seconds)
             process = await asyncio.create_subprocess_exec(
                 *cmd,
-                stdout=asyncio.subprocess.PIPE,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=(
+                    asyncio.subprocess.PIPE
+                    if _CAPTURE_STDOUT
+                    else asyncio.subprocess.DEVNULL
+                ),
                 stderr=asyncio.subprocess.PIPE,
             )
-            stdout, stderr = await process.communicate()
-
-            files_created = os.listdir(temp_dir)
-            json_path = os.path.join(temp_dir, "output.json")
-
-            if os.path.exists(json_path):
-                return self._parse_whisper_output(json_path)
-            else:
-                if process.returncode == 0:
-                    json_files = [f for f in files_created if f.endswith(".json")]
-                    if json_files:
-                        json_path = os.path.join(temp_dir, json_files[0])
-                        return self._parse_whisper_output(json_path)
-
-                    if stdout:
-                        return self._parse_stdout_output(stdout.decode())
-
-                raise Exception(
-                    f"Whisper.cpp failed with code {process.returncode}: {stderr.decode()}"
+            stdout, stderr = await process.communicate(data)
+            if not (stderr and any(err in stderr for err in _STDIN_UNSUPPORTED_ERRORS)):
+                return await asyncio.to_thread(
+                    self._collect_output, process.returncode, stdout, stderr
                 )
-        finally:
-            import shutil
+            # Сборка искала файл с именем "-": дальше только временные файлы
+            Path(self._json_path).unlink(missing_ok=True)
+            _NO_STDIN_CLIS.add(self.whisper_cli_path)
+            logging.warning(
+                "whisper.cpp cannot read audio from stdin, using temporary files"
+            )
 
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        audio_path = await asyncio.to_thread(write_temp_file, data, suffix)
+        try:
+            return await self.generate_async(audio_path=audio_path, request=request)
+        finally:
+            Path(audio_path).unlink(missing_ok=True)
 
     def _generate_subtitle_file(self, result: dict, format: str) -> str:
         """Генерация субтитров из результата"""
-        content = []
+        segments = result.get("segments", [])
 
         if format == "srt":
-            for i, segment in enumerate(result.get("segments", [])):
-                content.append(str(i + 1))
-                start_time = self._seconds_to_srt_time(segment["start"])
-                end_time = self._seconds_to_srt_time(segment["end"])
-                content.append(f"{start_time} --> {end_time}")
-                content.append(segment["text"].strip())
-                content.append("")
+            # По 4 строки на сегмент: номер, время, текст, пустая строка
+            content = [""] * (4 * len(segments))
+            i = 0
+            for idx, segment in enumerate(segments):
+                start_time = _format_timestamp(segment["start"], ",")
+                end_time = _format_timestamp(segment["end"], ",")
+                content[i] = str(idx + 1)
+                content[i + 1] = f"{start_time} --> {end_time}"
+                content[i + 2] = segment["text"].strip()
+                i += 4
 
         elif format == "vtt":
-            content.append("WEBVTT")
-            content.append("")
-            for segment in result.get("segments", []):
-                start_time = self._seconds_to_vtt_time(segment["start"])
-                end_time = self._seconds_to_vtt_time(segment["end"])
-                content.append(f"{start_time} --> {end_time}")
-                content.append(segment["text"].strip())
-                content.append("")
+            # Заголовок и по 3 строки на сегмент: время, текст, пустая строка
+            content = [""] * (2 + 3 * len(segments))
+            content[0] = "WEBVTT"
+            i = 2
+            for segment in segments:
+                start_time = _format_timestamp(segment["start"])
+                end_time = _format_timestamp(segment["end"])
+                content[i] = f"{start_time} --> {end_time}"
+                content[i + 1] = segment["text"].strip()
+                i += 3
 
-        return "\n".join(content)
-
-    def _seconds_to_srt_time(self, seconds: float) -> str:
-        """Конвертация секунд в формат времени SRT"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{secs:06.3f}".replace(".", ",")
+        else:
+            content = []
 
-    def _seconds_to_vtt_time(self, seconds: float) -> str:
-        """Конвертация секунд в формат времени VTT"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
+        return "\n".join(content)
 
     def _format_response(
         self, result: dict, request: STTRequestForm
@@ -390,16 +479,10 @@ class WhisperCppModel:
             text = result.get("text", "")
             language = result.get("language", "en")
 
-            duration = 0
-            if "segments" in result:
-                for segment in result["segments"]:
-                    if "end" in segment:
-                        duration = max(duration, segment["end"])
+            duration = result.get("duration", 0.0)
 
             words = []
-            if request.timestamp_granularities and "word" in [
-                g.value for g in request.timestamp_granularities
-            ]:
+            if request.wants_word_timestamps:
                 for segment in result.get("segments", []):
                     for word_data in segment.get("words", []):
                         word = TranscriptionWord(
@@ -1,39 +1,70 @@
 import os
 import tempfile
-from pathlib import Path
-from typing import Union
+from functools import lru_cache
+from typing import List, Union
 
+import mlx.core as mx
+import mlx.nn as nn
+import numpy as np
 from mlx_whisper import transcribe
+from mlx_whisper.audio import (
+    CHUNK_LENGTH,
+    N_FRAMES,
+    SAMPLE_RATE,
+    load_audio,
+    log_mel_spectrogram,
+    pad_or_trim,
+)
+from mlx_whisper.decoding import DecodingOptions, decode
+from mlx_whisper.load_models import load_model
+from mlx_whisper.transcribe import ModelHolder
 from mlx_whisper.writers import WriteSRT, WriteVTT
 
+from ..utils.logger import logger
 from .schema import (
     ResponseFormat,
     STTRequestForm,
     TranscriptionResponse,
     TranscriptionWord,
 )
+from .settings import settings
+from .upload import save_upload_file
+
+
+# mlx_whisper keeps only the last used model and reloads the weights whenever
+# a request asks for another one; keep the most recent few in memory instead
+@lru_cache(maxsize=max(1, settings.stt_model_cache))
+def _load_model(path_or_hf_repo: str, dtype: mx.Dtype) -> nn.Module:
+    return load_model(path_or_hf_repo, dtype=dtype)
+
+
+def _transcribe(path_or_hf_repo: str, **kwargs) -> dict:
+    """`transcribe` on the cached copy of the model.
+
+    `transcribe` only takes a model path and resolves it through
+    `ModelHolder`, so the holder is pointed at the cached model right before
+    the call instead of reloading it from disk.
+    """
+    ModelHolder.model = _load_model(path_or_hf_repo, mx.float16)
+    ModelHolder.model_path = path_or_hf_repo
+    return transcribe(path_or_hf_repo=path_or_hf_repo, **kwargs)
+
+# Clips up to one decoder window long can be decoded together
+_BATCH_MAX_SECONDS = CHUNK_LENGTH
 
 
 class WhisperModel:
 
     async def _save_upload_file(self, file) -> str:
-        suffix = Path(file.filename).suffix
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            return tmp.name
+        return await save_upload_file(file)
 
     def generate(self, audio_path: str, request: STTRequestForm):
-        word_timestamps = False
-        if request.timestamp_granularities:
-            word_timestamps = "word" in [
-                g.value for g in request.timestamp_granularities
-            ]
+        word_timestamps = request.wants_word_timestamps
 
         print(f"word_timestamps: {word_timestamps}")
-        result = transcribe(
+        result = _transcribe(
+            request.model,
             audio=audio_path,
-            path_or_hf_repo=request.model,
             temperature=request.temperature,
             initial_prompt=request.prompt,
             language=request.language,
@@ -43,6 +74,96 @@ class WhisperModel:
         )
         return result
 
+    def generate_batch(
+        self, audio_paths: List[str], requests: List[STTRequestForm]
+    ) -> List[Union[dict, Exception]]:
+        """Transcribe several clips with shared decoding options in one pass.
+
+        Clips of up to 30 seconds are stacked into a single mel batch and
+        decoded together, each becoming one segment without timestamps and
+        without the temperature fallback of `transcribe`. Longer clips go
+        through `generate` one by one. A clip that fails gets its exception
+        in place of a result, so it does not fail the rest of the batch.
+        """
+        options = requests[0]
+        model = _load_model(options.model, mx.float16)
+
+        results: List[Union[dict, Exception, None]] = [None] * len(audio_paths)
+        batch, mels, durations = [], [], []
+        for i, (path, request) in enumerate(zip(audio_paths, requests)):
+            try:
+                audio = load_audio(path)
+                duration = audio.shape[0] / SAMPLE_RATE
+                if duration > _BATCH_MAX_SECONDS:
+                    results[i] = self.generate(audio_path=path, request=request)
+                    continue
+                mel = log_mel_spectrogram(audio, n_mels=model.dims.n_mels)
+            except Exception as e:
+                results[i] = e
+                continue
+            mels.append(pad_or_trim(mel, N_FRAMES, axis=-2))
+            durations.append(duration)
+            batch.append(i)
+
+        if not batch:
+            return results
+
+        try:
+            decoded = decode(
+                model,
+                mx.stack(mels).astype(mx.float16),
+                DecodingOptions(
+                    language=options.language,
+                    temperature=options.temperature or 0.0,
+                    prompt=options.prompt,
+                    without_timestamps=True,
+                ),
+            )
+        except Exception as e:
+            # Find the offending clip by decoding each one on its own
+            logger.warning(f"Batched STT decode failed, retrying one by one: {e}")
+            for i in batch:
+                try:
+                    results[i] = self.generate(
+                        audio_path=audio_paths[i], request=requests[i]
+                    )
+                except Exception as item_error:
+                    results[i] = item_error
+            return results
+
+        for i, duration, result in zip(batch, durations, decoded):
+            results[i] = {
+                "text": result.text,
+                "language": result.language,
+                "segments": [
+                    {
+                        "id": 0,
+                        "seek": 0,
+                        "start": 0.0,
+                        "end": duration,
+                        "text": result.text,
+                        "tokens": result.tokens,
+                        "temperature": result.temperature,
+                        "avg_logprob": result.avg_logprob,
+                        "compression_ratio": result.compression_ratio,
+                        "no_speech_prob": result.no_speech_prob,
+                    }
+                ],
+            }
+        return results
+
+    def warmup(self, model_id: str) -> None:
+        """Load the model and run one second of silence through it.
+
+        Materializes the weights, mel filters and compiled kernels so that
+        the first real request does not pay for them.
+        """
+        _transcribe(
+            model_id,
+            audio=np.zeros(16000, dtype=np.float32),
+            verbose=None,
+        )
+
     def _generate_subtitle_file(self, result: dict, format: str) -> str:
         temp_dir = None
         temp_file = None
@@ -95,9 +216,7 @@ class WhisperModel:
                         duration = max(duration, segment["end"])
 
             words = []
-            if request.timestamp_granularities and "word" in [
-                g.value for g in request.timestamp_granularities
-            ]:
+            if request.wants_word_timestamps:
                 for segment in result.get("segments", []):
                     for word_data in segment.get("words", []):
                         word = TranscriptionWord(
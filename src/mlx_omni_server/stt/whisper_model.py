@@ -1,101 +1,268 @@
 import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Tuple, Union
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple, Union
 
-from .schema import STTRequestForm, TranscriptionResponse
+from ..utils.logger import logger
+from .schema import ResponseFormat, STTRequestForm, TranscriptionResponse
+from .settings import settings
 from .whisper_cpp import WhisperCppModel
 from .whisper_mlx import WhisperModel
 
+# whisper.cpp configuration, resolved once from the settings
+_CPP_KWARGS: Mapping[str, Any] = MappingProxyType(
+    {
+        "whisper_cli_path": settings.whisper_cpp_cli,
+        "model_path": settings.whisper_cpp_model,
+        "vad_model_path": settings.whisper_cpp_vad_model,
+        "threads": settings.whisper_cpp_threads,
+    }
+)
+_CPP_KEY: Tuple[str, str, str, int] = tuple(_CPP_KWARGS.values())
+_CPP_MAX_WORKERS = settings.whisper_cpp_max_workers
+# Загрузки больше этого размера не читаются в память, а идут через диск
+_CPP_STDIN_MAX_BYTES = int(settings.whisper_cpp_stdin_max_mb * 1024 * 1024)
+
+# MLX Whisper inference blocks for seconds, so it runs on a bounded pool
+# instead of the event loop; one worker keeps a single model busy at a time
+_mlx_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.stt_max_concurrency),
+    thread_name_prefix="stt",
+)
+
+# Micro-batching of MLX Whisper requests, off unless STT_BATCH > 1
+_BATCH_MAX = max(1, settings.stt_batch)
+_BATCH_WAIT = settings.stt_batch_wait_ms / 1000
+# How often the batch window checks the queue for more requests
+_BATCH_POLL = 0.002
+# Batched clips come back as one segment without timestamps, so only the
+# formats that carry nothing but the text are batched
+_BATCH_FORMATS = frozenset({ResponseFormat.JSON, ResponseFormat.TEXT})
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
 
 class STTService:
     _whisper_model: WhisperModel | None = None
-    _whisper_cpp_pools: Dict[
-        Tuple[str, str, str, int], List[WhisperCppModel]
-    ] = {}
+    _whisper_cpp_pools: Dict[Tuple[str, str, str, int], List[WhisperCppModel]] = {}
     _semaphores: Dict[Tuple[str, str, str, int], asyncio.BoundedSemaphore] = {}
 
+    _cpp_lock: asyncio.Lock | None = None
+    _batch_queue: asyncio.Queue | None = None
+    _batch_task: asyncio.Task | None = None
+
     def __init__(self) -> None:
-        """Pre-create whisper.cpp models for the configured worker count."""
-        key = self._get_cpp_key()
-        if key not in self.__class__._semaphores:
-            max_workers = int(os.getenv("WHISPER_CPP_MAX_WORKERS", "4"))
-            self.__class__._semaphores[key] = asyncio.BoundedSemaphore(max_workers)
-            pool = self.__class__._whisper_cpp_pools.setdefault(key, [])
-            for _ in range(max_workers):
-                pool.append(
-                    WhisperCppModel(
-                        whisper_cli_path=key[0],
-                        model_path=key[1],
-                        vad_model_path=key[2],
-                        threads=key[3],
-                    )
+        # The whisper.cpp pool is built on the first whisper.cpp request, so
+        # the service starts even when whisper.cpp is not installed
+        self._cpp_semaphore: asyncio.BoundedSemaphore | None = None
+        self._cpp_pool: List[WhisperCppModel] | None = None
+
+    async def _ensure_cpp_pool(self) -> None:
+        """Create the whisper.cpp models for the configured worker count once."""
+        cls = self.__class__
+        key = _CPP_KEY
+        if cls._cpp_lock is None:
+            cls._cpp_lock = asyncio.Lock()
+        async with cls._cpp_lock:
+            if key not in cls._semaphores:
+                logger.info(
+                    f"Creating {_CPP_MAX_WORKERS} whisper.cpp workers: "
+                    f"{dict(_CPP_KWARGS)}"
                 )
+                pool = [WhisperCppModel(**_CPP_KWARGS) for _ in range(_CPP_MAX_WORKERS)]
+                cls._whisper_cpp_pools[key] = pool
+                cls._semaphores[key] = asyncio.BoundedSemaphore(_CPP_MAX_WORKERS)
+
+        self._cpp_semaphore = cls._semaphores[key]
+        self._cpp_pool = cls._whisper_cpp_pools[key]
 
     def _get_whisper_model(self) -> WhisperModel:
         if self.__class__._whisper_model is None:
             self.__class__._whisper_model = WhisperModel()
         return self.__class__._whisper_model
 
-    def _get_cpp_key(self) -> Tuple[str, str, str, int]:
-        return (
-            os.getenv("WHISPER_CPP_CLI", "./whisper.cpp/build/bin/whisper-cli"),
-            os.getenv("WHISPER_CPP_MODEL", "./whisper.cpp/models/ggml-large-v3.bin"),
-            os.getenv("WHISPER_CPP_VAD_MODEL", "./whisper.cpp/models/ggml-silero-v5.1.2.bin"),
-            int(os.getenv("WHISPER_CPP_THREADS", "32")),
-        )
+    async def warmup(self, model_id: str) -> None:
+        """Preload an MLX Whisper model before the first request."""
+        model = self._get_whisper_model()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(_mlx_executor, model.warmup, model_id)
+            logger.info(f"Warmed up STT model {model_id}")
+        except Exception as e:
+            logger.warning(f"STT warmup for {model_id} failed: {str(e)}")
 
     async def _acquire_cpp_model(self) -> WhisperCppModel:
-        key = self._get_cpp_key()
-        if key not in self.__class__._semaphores:
-            # fallback when service was not initialised yet
-            max_workers = int(os.getenv("WHISPER_CPP_MAX_WORKERS", "2"))
-            self.__class__._semaphores[key] = asyncio.BoundedSemaphore(max_workers)
-            pool = self.__class__._whisper_cpp_pools.setdefault(key, [])
-            for _ in range(max_workers):
-                pool.append(
-                    WhisperCppModel(
-                        whisper_cli_path=key[0],
-                        model_path=key[1],
-                        vad_model_path=key[2],
-                        threads=key[3],
-                    )
+        if self._cpp_pool is None:
+            await self._ensure_cpp_pool()
+        await self._cpp_semaphore.acquire()
+        return self._cpp_pool.pop()
+
+    def _release_cpp_model(self, model: WhisperCppModel) -> None:
+        self._cpp_pool.append(model)
+        self._cpp_semaphore.release()
+
+    async def _transcribe_batched(
+        self, audio_path: str, request: STTRequestForm
+    ) -> dict:
+        """Queue a request for the batch worker and wait for its result.
+
+        The worker owns `audio_path` from here on and removes it once the
+        batch is decoded, even if the caller has gone away.
+        """
+        cls = self.__class__
+        if cls._batch_queue is None:
+            cls._batch_queue = asyncio.Queue()
+            cls._batch_task = asyncio.create_task(self._batch_worker(cls._batch_queue))
+
+        future = asyncio.get_running_loop().create_future()
+        cls._batch_queue.put_nowait((audio_path, request, future))
+        return await future
+
+    async def _batch_worker(self, queue: asyncio.Queue) -> None:
+        """Collect requests for a short window and decode them together.
+
+        Requests are grouped by the options that the decoder shares across
+        a batch; requests arriving while a batch runs form the next one.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await queue.get()]
+            deadline = loop.time() + _BATCH_WAIT
+            # Poll instead of wait_for(queue.get()): on Python 3.11 a get that
+            # times out right as an item arrives can drop that item
+            while len(pending) < _BATCH_MAX:
+                try:
+                    pending.append(queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, _BATCH_POLL))
+
+            groups: Dict[tuple, list] = {}
+            for item in pending:
+                request = item[1]
+                key = (
+                    request.model,
+                    request.language,
+                    request.prompt,
+                    request.temperature,
                 )
+                groups.setdefault(key, []).append(item)
 
-        await self.__class__._semaphores[key].acquire()
-        return self.__class__._whisper_cpp_pools[key].pop()
+            for items in groups.values():
+                try:
+                    await self._run_batch(items)
+                except Exception as e:
+                    # Keep serving the queue whatever went wrong with one batch
+                    logger.error(f"STT batch failed: {str(e)}", exc_info=True)
+                    for _, _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    for audio_path, _, _ in items:
+                        _remove_file(audio_path)
 
-    def _release_cpp_model(self, model: WhisperCppModel) -> None:
-        key = self._get_cpp_key()
-        self.__class__._whisper_cpp_pools.setdefault(key, []).append(model)
-        self.__class__._semaphores[key].release()
+    async def _run_batch(self, items: list) -> None:
+        # Requests whose caller has gone away are not decoded
+        items = [item for item in items if not item[2].done()]
+        if not items:
+            return
+
+        model = self._get_whisper_model()
+        loop = asyncio.get_running_loop()
+        try:
+            if len(items) == 1:
+                audio_path, request, _ = items[0]
+                results = [
+                    await loop.run_in_executor(
+                        _mlx_executor,
+                        partial(model.generate, audio_path=audio_path, request=request),
+                    )
+                ]
+            else:
+                results = await loop.run_in_executor(
+                    _mlx_executor,
+                    model.generate_batch,
+                    [audio_path for audio_path, _, _ in items],
+                    [request for _, request, _ in items],
+                )
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(items, results):
+            # The caller may have gone away in the meantime
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
 
     async def transcribe(
         self,
         request: STTRequestForm,
     ) -> Union[dict, str, TranscriptionResponse]:
+        audio_path: str | None = None
+        loop = asyncio.get_running_loop()
         try:
-            if "whisper.cpp" in request.model:
+            if request.use_whisper_cpp:
                 model = await self._acquire_cpp_model()
                 try:
-                    audio_path = await model._save_upload_file(request.file)
-                    result = await model.generate_async(
-                        audio_path=audio_path, request=request
-                    )
+                    size = request.file.size
+                    if (
+                        model.reads_stdin
+                        and size is not None
+                        and size <= _CPP_STDIN_MAX_BYTES
+                    ):
+                        # Small audio goes to whisper.cpp through stdin, with
+                        # no temp file
+                        data = await request.file.read()
+                        result = await model.generate_from_bytes_async(
+                            data, request, suffix=Path(request.file.filename).suffix
+                        )
+                    else:
+                        # Large uploads are streamed to disk instead of memory
+                        audio_path = await model._save_upload_file(request.file)
+                        result = await model.generate_async(audio_path, request)
                 finally:
-                    if "audio_path" in locals():
-                        Path(audio_path).unlink(missing_ok=True)
                     self._release_cpp_model(model)
             else:
                 model = self._get_whisper_model()
                 audio_path = await model._save_upload_file(request.file)
-                result = model.generate(audio_path=audio_path, request=request)
-                Path(audio_path).unlink(missing_ok=True)
+                # Word timestamps and subtitles need the full transcribe pipeline
+                if (
+                    _BATCH_MAX > 1
+                    and request.response_format in _BATCH_FORMATS
+                    and not request.wants_word_timestamps
+                ):
+                    batched_path, audio_path = audio_path, None
+                    result = await self._transcribe_batched(batched_path, request)
+                else:
+                    result = await loop.run_in_executor(
+                        _mlx_executor,
+                        partial(model.generate, audio_path=audio_path, request=request),
+                    )
+                # Subtitle formatting goes through temporary files, so it
+                # runs off the event loop but never queues behind inference
+                return await asyncio.to_thread(model._format_response, result, request)
 
             response = model._format_response(result, request)
             return response
 
-        except Exception as e:
-            if "audio_path" in locals():
-                Path(audio_path).unlink(missing_ok=True)
-            raise e
+        finally:
+            if audio_path is not None:
+                _remove_file(audio_path)
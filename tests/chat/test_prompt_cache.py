@@ -9,10 +9,14 @@ This test file verifies the prompt caching functionality in the chat completion
 
 import logging
 
+import mlx.core as mx
 import pytest
 from fastapi.testclient import TestClient
 from openai import OpenAI
 
+from mlx_omni_server.chat.mlx import mlx_model
+from mlx_omni_server.chat.mlx.mlx_model import RequestContext, RequestContextRegistry
+from mlx_omni_server.chat.mlx.prompt_cache import PromptCache, PromptCachePool
 from mlx_omni_server.main import app
 
 logging.basicConfig(level=logging.INFO)
@@ -83,3 +87,104 @@ class TestPromptCache:
         except Exception as e:
             logger.error(f"Error testing prompt cache: {str(e)}")
             raise
+
+
+class _Layer:
+    """Stand-in for an mlx-lm cache layer"""
+
+    def __init__(self, keys):
+        self.state = (keys,)
+
+
+class _ArrayLayer:
+    """Cache layer holding real arrays, as mlx-lm layers do"""
+
+    def __init__(self, size):
+        self.keys = mx.zeros((size,), dtype=mx.float16)
+        self.values = mx.zeros((size,), dtype=mx.float16)
+        self.offset = size
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+
+def _cache(model_key, tokens):
+    return PromptCache(tokens=list(tokens), model_key=model_key)
+
+
+class TestPromptCachePool:
+    """Unit tests for the shared prompt cache pool"""
+
+    def test_empty_pool_returns_fresh_cache(self):
+        pool = PromptCachePool(capacity=2, block_size=4)
+        cache = pool.acquire("model", [1, 2, 3])
+        assert cache.tokens == []
+        assert cache.model_key == ""
+
+    def test_reuses_cache_with_shared_prefix(self):
+        pool = PromptCachePool(capacity=2, block_size=4)
+        cached = _cache("model", range(10))
+        pool.release(cached)
+
+        assert pool.acquire("model", list(range(8)) + [99]) is cached
+        # Checked out caches are not handed to a second request
+        assert pool.acquire("model", list(range(8))) is not cached
+
+    def test_prefers_longest_block_prefix(self):
+        pool = PromptCachePool(capacity=4, block_size=4)
+        short = _cache("model", [0, 1, 2, 3, 7, 7, 7, 7])
+        long = _cache("model", range(12))
+        pool.release(long)
+        pool.release(short)
+
+        assert pool.acquire("model", list(range(12)) + [5]) is long
+
+    def test_matches_model(self):
+        pool = PromptCachePool(capacity=2, block_size=4)
+        pool.release(_cache("other", range(8)))
+
+        assert pool.acquire("model", list(range(8))).tokens == []
+
+    def test_evicts_least_recently_used(self):
+        pool = PromptCachePool(capacity=2, block_size=4)
+        first = _cache("model", [1] * 4)
+        pool.release(first)
+        pool.release(_cache("model", [2] * 4))
+        pool.release(_cache("model", [3] * 4))
+
+        assert len(pool) == 2
+        assert pool.acquire("model", [1] * 4) is not first
+
+    def test_conversations_share_completed_cache(self, monkeypatch):
+        pool = PromptCachePool(capacity=2, block_size=4)
+        monkeypatch.setattr(mlx_model, "_prompt_cache_pool", pool)
+        registry = RequestContextRegistry(capacity=2)
+
+        first = RequestContext("model", None, None)
+        cached = PromptCache(
+            tokens=list(range(10)), cache=[_Layer(["kv"])], model_key="model"
+        )
+        first.prompt_cache = cached
+        registry.release("first", first)
+
+        # The cache is handed over to the pool, not copied
+        assert first.prompt_cache is None
+        assert registry.acquire("first") is first
+        # Another conversation with the same system prompt hits the pool
+        assert pool.acquire("model", list(range(8)) + [99]) is cached
+
+    def test_evicts_over_byte_budget(self):
+        layer_bytes = _ArrayLayer(4).nbytes
+        pool = PromptCachePool(capacity=4, block_size=4, max_bytes=2 * layer_bytes)
+        first = PromptCache(tokens=[1] * 4, cache=[_ArrayLayer(4)], model_key="model")
+        pool.release(first)
+        pool.release(
+            PromptCache(tokens=[2] * 4, cache=[_ArrayLayer(4)], model_key="model")
+        )
+        pool.release(
+            PromptCache(tokens=[3] * 4, cache=[_ArrayLayer(4)], model_key="model")
+        )
+
+        assert len(pool) == 2
+        assert pool.acquire("model", [1] * 4) is not first
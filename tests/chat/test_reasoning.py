@@ -226,3 +226,44 @@ Hello! How can I assist you today? 😊"""
 
         assert result["reasoning"] == expected_reasoning
         assert result["content"] == expected_content
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "<think>\nThis is a thinking process.\n</think>\nHere is the final answer.",
+            "Okay, the user is just greeting me.\n</think>\n\nHello!",
+            "This is a direct response without thinking tags.",
+            "<think>Unfinished reasoning",
+            # Stray closing tag before a complete block
+            "Stray</think> text <think>Real reasoning</think> answer",
+            "Stray</think><think>Real reasoning</think>",
+            # Stray closing tag before an unclosed block
+            "Stray</think> text <think>Unfinished reasoning",
+            # Unbalanced tags around a complete block
+            "<think>First</think> middle </think> end",
+            "<think>Outer <think>inner</think> answer",
+        ],
+    )
+    @pytest.mark.parametrize("step", [1, 3, 7])
+    def test_feed_matches_decode(self, decoder, text, step):
+        """Test that incremental feeding gives the same split as decode"""
+        decoder.enable_thinking = True
+        decoder.reset()
+
+        # Feed in small pieces so tags are split across deltas
+        for i in range(0, len(text), step):
+            decoder.feed(text[i : i + step])
+
+        assert decoder.finalize() == decoder.decode(text)
+
+    def test_feed_with_thinking_disabled(self, decoder):
+        """Test that feeding with thinking disabled keeps the raw text"""
+        decoder.enable_thinking = False
+        decoder.reset()
+
+        decoder.feed("<think>Reasoning")
+        decoder.feed(" process</think>Final answer")
+
+        assert decoder.finalize() == {
+            "content": "<think>Reasoning process</think>Final answer"
+        }
@@ -1,10 +1,13 @@
 import json
 import logging
+from types import SimpleNamespace
 
 import pytest
 from fastapi.testclient import TestClient
 from openai import OpenAI
 
+from mlx_omni_server.chat.mlx import outlines_logits_processor
+from mlx_omni_server.chat.mlx.outlines_logits_processor import OutlinesLogitsProcessor
 from mlx_omni_server.main import app
 
 logging.basicConfig(level=logging.INFO)
@@ -129,3 +132,59 @@ class TestStructuredOutput:
         except Exception as e:
             logger.error(f"Test error: {str(e)}")
             raise
+
+
+class _FakeGuide:
+    """Stand-in for outlines' JSONLogitsProcessor that records its schema"""
+
+    def __init__(self, schema_json, tokenizer):
+        self.schema_json = schema_json
+
+    def copy(self):
+        return _FakeGuide(self.schema_json, None)
+
+
+class _FakeTokenizer:
+    _tokenizer = None
+
+
+class TestJSONGuideCache:
+
+    @pytest.fixture(autouse=True)
+    def fake_outlines(self, monkeypatch):
+        monkeypatch.setattr(
+            outlines_logits_processor, "JSONLogitsProcessor", _FakeGuide
+        )
+        monkeypatch.setattr(
+            outlines_logits_processor, "TransformerTokenizer", lambda tokenizer: None
+        )
+        outlines_logits_processor._compile_json_processor.cache_clear()
+        yield
+        outlines_logits_processor._compile_json_processor.cache_clear()
+
+    @staticmethod
+    def _processor(tokenizer, schema):
+        response_format = SimpleNamespace(
+            json_schema=SimpleNamespace(schema_def=schema)
+        )
+        return OutlinesLogitsProcessor(tokenizer, response_format)
+
+    def test_key_order_variants_get_their_own_guide(self):
+        tokenizer = _FakeTokenizer()
+        name_first = {"type": "object", "properties": {"name": {}, "hex": {}}}
+        hex_first = {"type": "object", "properties": {"hex": {}, "name": {}}}
+
+        first = self._processor(tokenizer, name_first).logits_processor
+        second = self._processor(tokenizer, hex_first).logits_processor
+
+        assert first.schema_json == json.dumps(name_first)
+        assert second.schema_json == json.dumps(hex_first)
+
+    def test_same_schema_reuses_guide(self):
+        tokenizer = _FakeTokenizer()
+        schema = {"type": "object", "properties": {"name": {}}}
+
+        self._processor(tokenizer, schema)
+        self._processor(tokenizer, schema)
+
+        assert outlines_logits_processor._compile_json_processor.cache_info().hits == 1
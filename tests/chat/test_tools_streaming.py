@@ -1,33 +1,106 @@
 import logging
-import json
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
 
+import anyio
+import httpx
+import orjson
 import pytest
-from fastapi.testclient import TestClient
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from mlx_omni_server.main import app
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Run every test on one asyncio loop shared by the whole session
+pytestmark = pytest.mark.anyio
 
-@pytest.fixture
-def client():
-    """Create test client"""
-    return TestClient(app)
 
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
 
-@pytest.fixture
-def openai_client(client):
-    """Create OpenAI client configured with test server"""
-    return OpenAI(
-        base_url="http://test/v1",
-        api_key="test",
-        http_client=client,
+
+@pytest.fixture(scope="session")
+async def openai_client(anyio_backend):
+    """Create OpenAI client calling the app in-process, one session for all tests"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+        yield AsyncOpenAI(
+            base_url="http://test/v1",
+            api_key="test",
+            http_client=http_client,
+            # A failed assertion should not be retried behind the test's back
+            max_retries=0,
+            timeout=httpx.Timeout(60.0, connect=1.0),
+        )
+
+
+MODEL = "mlx-community/gemma-3-1b-it-4bit-DWQ"
+
+
+@pytest.fixture(scope="module")
+async def warm_up_model(anyio_backend, openai_client):
+    """Load the real model once; integration tests opt in with usefixtures"""
+    await openai_client.chat.completions.create(
+        model=MODEL,
+        messages=[{"role": "user", "content": "Hi"}],
+        max_tokens=1,
     )
 
 
+async def _stream_chunks(payload: dict) -> List[Tuple[float, bytes, bool]]:
+    """POST a streaming chat completion straight to the ASGI app.
+
+    httpx.ASGITransport collects the whole body before returning it, so the
+    app is driven directly and every body message is recorded as it is sent:
+    (time sent, body, more_body).
+    """
+    body = orjson.dumps(payload)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/chat/completions",
+        "raw_path": b"/v1/chat/completions",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"test"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+    request_sent = False
+    finished = anyio.Event()
+    chunks: List[Tuple[float, bytes, bool]] = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client stays connected until the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            more_body = message.get("more_body", False)
+            chunks.append((time.perf_counter(), message.get("body", b""), more_body))
+            if not more_body:
+                finished.set()
+
+    await app(scope, receive, send)
+    finished.set()
+    return chunks
+
+
 def get_weather_tools():
     """Return sample weather tools for testing"""
     return [
@@ -56,134 +129,134 @@ def get_weather_tools():
     ]
 
 
+def _assert_tool_call_parity(normal_choice, streaming_tool_calls, saw_tool_calls_finish):
+    """Check that streaming reproduced the tool call of the non-streaming response"""
+    # If non-streaming detected tool calls, streaming should too
+    assert streaming_tool_calls is not None, "Streaming mode should detect tool calls when non-streaming does"
+    assert normal_choice.finish_reason == "tool_calls", "Non-streaming should have tool_calls finish_reason"
+
+    # The chunk with tool_calls finish_reason was captured while streaming
+    assert saw_tool_calls_finish, "Streaming should have chunk with tool_calls finish_reason"
+
+    # Compare tool call structure
+    normal_tool_call = normal_choice.message.tool_calls[0]
+    streaming_tool_call = streaming_tool_calls[0]
+
+    assert normal_tool_call.function.name == streaming_tool_call.function.name, \
+        "Tool call names should match between streaming and non-streaming"
+
+    # Compare arguments (parse JSON to handle formatting differences)
+    normal_args = orjson.loads(normal_tool_call.function.arguments)
+    streaming_args = orjson.loads(streaming_tool_call.function.arguments)
+    assert normal_args == streaming_args, \
+        "Tool call arguments should match between streaming and non-streaming"
+
+
+@pytest.mark.usefixtures("warm_up_model")
+class TestIncrementalStreaming:
+    """The stream must reach the client while the completion is still generating"""
+
+    async def test_chunks_arrive_before_completion(self):
+        started = time.perf_counter()
+        chunks = await _stream_chunks(
+            {
+                "model": MODEL,
+                "messages": [{"role": "user", "content": "Count from one to twenty."}],
+                "max_tokens": 48,
+                "stream": True,
+            }
+        )
+
+        data_chunks = [(at, body) for at, body, more in chunks if more and body]
+        assert len(data_chunks) > 1, "Streaming should send several body chunks"
+        assert not chunks[-1][2], "The response should end with more_body=False"
+
+        first_at, last_at = data_chunks[0][0], data_chunks[-1][0]
+        # A buffered response would send every chunk back to back at the end
+        assert last_at - first_at > 0.1 * (last_at - started), \
+            "The first chunk should arrive well before the last one"
+
+
+@pytest.mark.usefixtures("warm_up_model")
 class TestToolsStreaming:
     """Test class to verify tool calls work the same way in streaming and non-streaming modes"""
 
-    def test_tool_calls_comparison(self, openai_client):
+    @pytest.mark.parametrize(
+        "tool_choice, prompt",
+        [
+            ("auto", "What's the weather like in Boston?"),
+            ("required", "Get weather for New York"),
+        ],
+    )
+    async def test_tool_calls(self, openai_client, tool_choice, prompt):
         """Test that tool calls produce the same structure in both streaming and non-streaming modes"""
         
-        model = "mlx-community/gemma-3-1b-it-4bit-DWQ"
         tools = get_weather_tools()
-        messages = [
-            {"role": "user", "content": "What's the weather like in Boston?"}
-        ]
+        messages = [{"role": "user", "content": prompt}]
         
         # Test non-streaming mode
-        response_normal = openai_client.chat.completions.create(
-            model=model,
+        response_normal = await openai_client.chat.completions.create(
+            model=MODEL,
             messages=messages,
             tools=tools,
-            tool_choice="auto",
+            tool_choice=tool_choice,
             stream=False
         )
         
-        logger.info(f"Non-streaming response: {response_normal}")
+        logger.info("Non-streaming response: %s", response_normal)
         
         # Test streaming mode
-        stream = openai_client.chat.completions.create(
-            model=model,
+        stream = await openai_client.chat.completions.create(
+            model=MODEL,
             messages=messages,
             tools=tools,
-            tool_choice="auto",
+            tool_choice=tool_choice,
             stream=True
         )
         
-        # Collect streaming chunks
-        streaming_chunks = []
-        streaming_content = ""
+        # Collect streaming chunks in a single pass
+        content_parts: List[str] = []
         streaming_tool_calls = None
+        saw_tool_call_delta = False
+        saw_tool_calls_finish = False
         
-        for chunk in stream:
-            streaming_chunks.append(chunk)
-            logger.info(f"Streaming chunk: {chunk}")
+        async for chunk in stream:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Streaming chunk: %s", chunk)
             
             choice = chunk.choices[0]
             if choice.delta.content:
-                streaming_content += choice.delta.content
+                content_parts.append(choice.delta.content)
             
             # Check for tool calls in delta
-            if choice.delta.tool_calls:
-                streaming_tool_calls = choice.delta.tool_calls
+            if choice.delta.tool_calls is not None:
+                saw_tool_call_delta = True
+                if choice.delta.tool_calls:
+                    streaming_tool_calls = choice.delta.tool_calls
+            saw_tool_calls_finish = saw_tool_calls_finish or choice.finish_reason == "tool_calls"
+        
+        streaming_content = "".join(content_parts)
+        logger.info("Streaming content: %s", streaming_content)
         
         # Compare results
         normal_choice = response_normal.choices[0]
         
-        logger.info(f"Normal finish_reason: {normal_choice.finish_reason}")
-        logger.info(f"Normal tool_calls: {normal_choice.message.tool_calls}")
-        logger.info(f"Streaming tool_calls: {streaming_tool_calls}")
-        
-        # Validate that both modes produce similar results
-        if normal_choice.message.tool_calls:
-            # If non-streaming detected tool calls, streaming should too
-            assert streaming_tool_calls is not None, "Streaming mode should detect tool calls when non-streaming does"
-            assert normal_choice.finish_reason == "tool_calls", "Non-streaming should have tool_calls finish_reason"
-            
-            # Find the chunk with tool_calls finish_reason in streaming
-            tool_call_chunks = [chunk for chunk in streaming_chunks 
-                               if chunk.choices[0].finish_reason == "tool_calls"]
-            assert len(tool_call_chunks) > 0, "Streaming should have chunk with tool_calls finish_reason"
-            
-            # Compare tool call structure
-            normal_tool_call = normal_choice.message.tool_calls[0]
-            streaming_tool_call = streaming_tool_calls[0]
-            
-            assert normal_tool_call.function.name == streaming_tool_call.function.name, \
-                "Tool call names should match between streaming and non-streaming"
-            
-            # Compare arguments (parse JSON to handle formatting differences)
-            normal_args = json.loads(normal_tool_call.function.arguments)
-            streaming_args = json.loads(streaming_tool_call.function.arguments)
-            assert normal_args == streaming_args, \
-                "Tool call arguments should match between streaming and non-streaming"
+        logger.info("Normal finish_reason: %s", normal_choice.finish_reason)
+        logger.info("Normal tool_calls: %s", normal_choice.message.tool_calls)
+        logger.info("Streaming tool_calls: %s", streaming_tool_calls)
         
+        if tool_choice == "required":
+            # Both should produce tool calls when required
+            assert normal_choice.message.tool_calls is not None, \
+                "Non-streaming should produce tool calls when required"
+            assert normal_choice.finish_reason == "tool_calls", \
+                "Non-streaming should have tool_calls finish_reason when required"
+            assert saw_tool_call_delta, \
+                "Streaming should produce tool calls when required"
+        elif normal_choice.message.tool_calls:
+            # Validate that both modes produce similar results
+            _assert_tool_call_parity(normal_choice, streaming_tool_calls, saw_tool_calls_finish)
         else:
             # If non-streaming didn't detect tool calls, streaming shouldn't either
             # (or it's a case where the model didn't use tools)
             logger.info("No tool calls detected in non-streaming mode")
-
-    def test_tool_calls_required_mode(self, openai_client):
-        """Test tool calls in required mode for both streaming and non-streaming"""
-        
-        model = "mlx-community/gemma-3-1b-it-4bit-DWQ"
-        tools = get_weather_tools()
-        messages = [
-            {"role": "user", "content": "Get weather for New York"}
-        ]
-        
-        # Test non-streaming with required tool choice
-        response_normal = openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=tools,
-            tool_choice="required",
-            stream=False
-        )
-        
-        # Test streaming with required tool choice
-        stream = openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=tools,
-            tool_choice="required",
-            stream=True
-        )
-        
-        # Collect streaming results
-        streaming_chunks = list(stream)
-        
-        # Both should produce tool calls when required
-        normal_choice = response_normal.choices[0]
-        
-        logger.info(f"Required mode - Normal response: {response_normal}")
-        logger.info(f"Required mode - Streaming chunks: {len(streaming_chunks)}")
-        
-        assert normal_choice.message.tool_calls is not None, \
-            "Non-streaming should produce tool calls when required"
-        assert normal_choice.finish_reason == "tool_calls", \
-            "Non-streaming should have tool_calls finish_reason when required"
-        
-        # Check streaming results
-        tool_call_chunks = [chunk for chunk in streaming_chunks 
-                           if chunk.choices[0].delta.tool_calls is not None]
-        assert len(tool_call_chunks) > 0, \
-            "Streaming should produce tool calls when required" 
\ No newline at end of file